@@ -1,4 +1,6 @@
 from .business import get_user, create_user, create_session, get_session, delete_session, verify_session
+from .session_cache import session_cache
+from .passwords import hash_password, check_password
 from . import constants
 
-__all__ = ['get_user', 'create_user', 'create_session', 'get_session', 'delete_session', 'verify_session', 'constants']
\ No newline at end of file
+__all__ = ['get_user', 'create_user', 'create_session', 'get_session', 'delete_session', 'verify_session', 'session_cache', 'hash_password', 'check_password', 'constants']
\ No newline at end of file
@@ -1,7 +1,9 @@
 from fastapi import HTTPException, Request, status
-import bcrypt
 from uuid6 import uuid6
 from auth.business.constants import SESSION_ID_COOKIE
+from common.profiling import timed
+from auth.business.session_cache import session_cache
+from auth.business.passwords import hash_password
 from auth.dal import get_user as get_user_db, create_user as create_user_db, create_session as create_session_db, get_session, delete_session as delete_session_dl
 from auth.entities import UserCreation, User, Session
 from datetime import datetime, timedelta, timezone
@@ -14,7 +16,7 @@ async def create_user(user_creation: UserCreation):
         str(uuid6()),
         user_creation.username, 
         user_creation.name, 
-        bcrypt.hashpw(user_creation.password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        await hash_password(user_creation.password)
     )
     return await create_user_db(user)
 
@@ -31,6 +33,7 @@ async def create_session(user: User):
     }
     return session
 
+@timed('session_verify')
 async def verify_session(req: Request, optional = False):
     auth = req.cookies.get(SESSION_ID_COOKIE)
     if not auth:
@@ -41,6 +44,10 @@ async def verify_session(req: Request, optional = False):
             )
         return None
     session_id = auth
+    cached_session = session_cache.get(session_id)
+    if cached_session:
+        # The cache never serves a session past its `expires_at`.
+        return cached_session
     session = await get_session(session_id)
     if not session:
         raise HTTPException(
@@ -54,9 +61,11 @@ async def verify_session(req: Request, optional = False):
             detail=f'Session expired.'
         )
     # Valid session, proceed.
+    session_cache.put(session)
     return session
     
 async def delete_session(session_id: str):
+    session_cache.invalidate(session_id)
     return await delete_session_dl(session_id)
     # In a production system, I'd queue this operation if not successfully done.
 
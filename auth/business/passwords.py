@@ -0,0 +1,61 @@
+from asyncio import get_running_loop
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import os
+from typing import Union
+import bcrypt
+from common.config import LazyConfig
+
+@dataclass
+class PasswordHashingConfig:
+    '''
+    bcrypt settings, overridable through the `BCRYPT_*` environment variables.
+    '''
+    # bcrypt cost factor: each increment doubles the time taken to hash / check a password.
+    rounds: int = 12
+    # Maximum number of passwords hashed / checked at the same time.
+    max_concurrency: int = 4
+
+    @staticmethod
+    def from_env():
+        defaults = PasswordHashingConfig()
+        return PasswordHashingConfig(
+            rounds=int(os.getenv('BCRYPT_ROUNDS', defaults.rounds)),
+            max_concurrency=int(os.getenv('BCRYPT_MAX_CONCURRENCY', defaults.max_concurrency))
+        )
+
+class PasswordHasher:
+    '''
+    Runs bcrypt on a bounded thread pool rather than on the event loop.
+    bcrypt releases the GIL while hashing, so a login storm only queues up on this pool, without stalling other requests.
+    '''
+    config = LazyConfig(PasswordHashingConfig.from_env)
+
+    def __init__(self, config: Union[PasswordHashingConfig, None] = None) -> None:
+        self.config = config
+        self._executor: Union[ThreadPoolExecutor, None] = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.config.max_concurrency, thread_name_prefix='bcrypt')
+        return self._executor
+
+    async def hash(self, password: str) -> str:
+        executor = self._get_executor()
+        salt = bcrypt.gensalt(rounds=self.config.rounds)
+        pwd_hash = await get_running_loop().run_in_executor(executor, bcrypt.hashpw, password.encode('utf-8'), salt)
+        return pwd_hash.decode('utf-8')
+
+    async def check(self, password: str, pwd_hash: str) -> bool:
+        # The cost factor is read from the hash itself, so hashes created with older settings keep working.
+        return await get_running_loop().run_in_executor(
+            self._get_executor(), bcrypt.checkpw, password.encode('utf-8'), pwd_hash.encode('utf-8')
+        )
+
+password_hasher = PasswordHasher()
+
+async def hash_password(password: str):
+    return await password_hasher.hash(password)
+
+async def check_password(password: str, pwd_hash: str):
+    return await password_hasher.check(password, pwd_hash)
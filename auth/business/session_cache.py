@@ -0,0 +1,67 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+import os
+import time
+from typing import Union
+from auth.entities import Session
+from common.config import LazyConfig
+
+@dataclass
+class SessionCacheConfig:
+    '''
+    Size and TTL of the session cache, overridable through the `SESSION_CACHE_*` environment variables.
+    '''
+    max_size: int = 10_000
+    # Upper bound on how long a session may be served from memory, e.g. after it was deleted by another worker.
+    ttl_seconds: float = 60
+
+    @staticmethod
+    def from_env():
+        defaults = SessionCacheConfig()
+        return SessionCacheConfig(
+            max_size=int(os.getenv('SESSION_CACHE_SIZE', defaults.max_size)),
+            ttl_seconds=float(os.getenv('SESSION_CACHE_TTL_SECONDS', defaults.ttl_seconds))
+        )
+
+class SessionCache:
+    '''
+    In-process LRU cache of verified sessions, keyed by session id.
+    An entry is served for at most `ttl_seconds`, and never past the session's own `expires_at`.
+    '''
+    config = LazyConfig(SessionCacheConfig.from_env)
+
+    def __init__(self, config: Union[SessionCacheConfig, None] = None) -> None:
+        self.config = config
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[Session, float]] = OrderedDict()
+
+    def get(self, session_id: str) -> Union[Session, None]:
+        entry = self._entries.get(session_id)
+        if entry is not None:
+            (session, cached_until) = entry
+            if time.time() < cached_until:
+                self._entries.move_to_end(session_id)
+                self.hits += 1
+                return session
+            del self._entries[session_id]
+        self.misses += 1
+        return None
+
+    def put(self, session: Session):
+        config = self.config
+        cached_until = min(time.time() + config.ttl_seconds, session['expires_at'])
+        self._entries[session['id']] = (session, cached_until)
+        self._entries.move_to_end(session['id'])
+        while len(self._entries) > config.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, session_id: str):
+        self._entries.pop(session_id, None)
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+session_cache = SessionCache()
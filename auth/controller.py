@@ -1,8 +1,7 @@
-import bcrypt
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.responses import Response
 
-from auth.business import create_user, get_user, verify_session, create_session, delete_session
+from auth.business import create_user, get_user, verify_session, create_session, delete_session, check_password
 from auth.entities import UserCreation, Session, Credentials
 from auth.business.constants import SESSION_ID_COOKIE
 
@@ -44,7 +43,7 @@ async def login(res: Response, creds: Credentials):
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f'User with username {username} does not exist.'
         )
-    password_ok = bcrypt.checkpw(password.encode('utf-8'), existing_user.pwd_hash.encode('utf-8'))
+    password_ok = await check_password(password, existing_user.pwd_hash)
     if not password_ok:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -2,21 +2,32 @@ from typing import Union
 from auth.entities import User
 from auth.entities import Session
 from connection_pool import connection_pool
+from query_plans import register_query
 
-
-async def get_user(username: str):
-    sql = '''
+GET_USER_SQL = register_query('auth.get_user', '''
     SELECT id, username, name, pwd_hash
     FROM users
     WHERE username = ?
-    '''
+    ''', [''])
+
+GET_SESSION_SQL = register_query('auth.get_session', '''
+    SELECT id, user_id, expires_at
+    FROM sessions
+    WHERE id = ?
+    ''', [''])
+
+DELETE_SESSION_SQL = register_query('auth.delete_session', '''
+    DELETE FROM sessions
+    WHERE id = ?
+    ''', [''])
+
+async def get_user(username: str):
+    sql = GET_USER_SQL
     values = [username]
     async with connection_pool.connection() as conn:
-        cur = conn.cursor()
-        cur.execute(sql, values)
-        rows = cur.fetchall()
-        if rows:
-            (id, username, name, pwd_hash) = rows[0]
+        row = await conn.fetchone(sql, values)
+        if row:
+            (id, username, name, pwd_hash) = row
             return User(id, username, name, pwd_hash)
         return None
     
@@ -25,33 +36,27 @@ async def create_user(user: User):
         INSERT INTO users (id, username, name, pwd_hash) VALUES (?, ?, ?, ?)
     '''
     values = [user.id, user.username, user.name, user.pwd_hash]
-    async with connection_pool.connection() as conn:
-        conn.execute(sql, values)
-        conn.commit()
+    async with connection_pool.writer() as conn:
+        await conn.execute(sql, values)
+        await conn.commit()
 
 async def create_session(session_id: str, user_id: str, expires_at: float):
     sql = '''
         INSERT INTO sessions (id, user_id, expires_at) VALUES (?, ?, ?)
     '''
     values = [session_id, user_id, expires_at]
-    async with connection_pool.connection() as conn:
-        conn.execute(sql, values)
-        conn.commit()
+    async with connection_pool.writer() as conn:
+        await conn.execute(sql, values)
+        await conn.commit()
 
 async def get_session(session_id: str) -> Union[Session, None]:
-    sql = '''
-    SELECT id, user_id, expires_at
-    FROM sessions
-    WHERE id = ?
-    '''
+    sql = GET_SESSION_SQL
     values = [session_id]
     async with connection_pool.connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute(sql, values)
-        rows = cursor.fetchall()
-        if not rows:
+        row = await conn.fetchone(sql, values)
+        if not row:
             return None
-        (id, user_id, expires_at) = rows[0]
+        (id, user_id, expires_at) = row
         return {
             'id': id,
             'user_id': user_id,
@@ -59,14 +64,10 @@ async def get_session(session_id: str) -> Union[Session, None]:
         }
     
 async def delete_session(session_id: str) -> bool:
-    sql = '''
-    DELETE FROM sessions
-    WHERE id = ?
-    '''
+    sql = DELETE_SESSION_SQL
     values = [session_id]
-    async with connection_pool.connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute(sql, values)
-        conn.commit()
-        return cursor.rowcount > 0
+    async with connection_pool.writer() as conn:
+        rowcount = await conn.execute(sql, values)
+        await conn.commit()
+        return rowcount > 0
     
\ No newline at end of file
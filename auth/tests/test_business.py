@@ -2,7 +2,7 @@ import bcrypt
 from fastapi import HTTPException, Request, status
 import pytest
 from datetime import datetime, timedelta, timezone
-from auth.business import get_user, create_user, create_session, verify_session, delete_session
+from auth.business import get_user, create_user, create_session, verify_session, delete_session, session_cache
 from unittest.mock import Mock, AsyncMock, patch
 
 from auth.entities.session import Session
@@ -17,6 +17,9 @@ pwd_hash = bcrypt.hashpw("pwd_hash98B*".encode('utf-8'), fixed_bytes).decode('ut
 user_creation = UserCreation(username=username, name=name, password="pwd_hash98B*")
 user = User(id, username, name, pwd_hash)
 
+@pytest.fixture(autouse=True)
+def clear_session_cache():
+    session_cache.clear()
 
 @patch("auth.business.business.get_user_db", new_callable=AsyncMock)
 async def test_get_user_success(mock_get_user_db: AsyncMock):
@@ -176,4 +179,40 @@ async def test_verify_session_no_cookie(mock_get_session: AsyncMock):
     except HTTPException as he:
         assert he.status_code == status.HTTP_401_UNAUTHORIZED
         assert he.detail == "User must be logged in to view this info. Pass the session cookie with your request."
-        mock_get_session.assert_not_awaited()
\ No newline at end of file
+        mock_get_session.assert_not_awaited()
+
+@patch("auth.business.business.get_session", new_callable=AsyncMock)
+async def test_verify_session_served_from_cache(mock_get_session: AsyncMock):
+    session_id = "sess789"
+    session = { "id": session_id, "user_id": "1", "expires_at": datetime.now(timezone.utc).timestamp() + 60 }
+    req = Mock(spec=Request)
+    req.cookies = { 'session_id': session_id }
+    mock_get_session.return_value = session
+
+    assert await verify_session(req) == session
+    assert await verify_session(req) == session
+    mock_get_session.assert_awaited_once_with(session_id)
+    assert session_cache.hits == 1
+
+@patch("auth.business.business.get_session", new_callable=AsyncMock)
+@patch("auth.business.business.delete_session_dl", new_callable=AsyncMock)
+async def test_delete_session_invalidates_cache(mock_delete_session_dl: AsyncMock, mock_get_session: AsyncMock):
+    session_id = "sess789"
+    req = Mock(spec=Request)
+    req.cookies = { 'session_id': session_id }
+    mock_get_session.return_value = { "id": session_id, "user_id": "1", "expires_at": datetime.now(timezone.utc).timestamp() + 60 }
+    await verify_session(req)
+
+    await delete_session(session_id)
+    mock_delete_session_dl.assert_awaited_once_with(session_id)
+    mock_get_session.return_value = None
+    try:
+        await verify_session(req)
+        pytest.fail("A deleted session should not be served from the cache.")
+    except HTTPException as he:
+        assert he.status_code == status.HTTP_401_UNAUTHORIZED
+
+async def test_session_cache_respects_expiry():
+    session_cache.put({ "id": "sess000", "user_id": "1", "expires_at": datetime.now(timezone.utc).timestamp() - 1 })
+    assert session_cache.get("sess000") is None
+    assert session_cache.misses == 1
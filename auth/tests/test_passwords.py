@@ -0,0 +1,23 @@
+import asyncio
+from auth.business.passwords import PasswordHasher, PasswordHashingConfig
+
+async def test_hash_and_check_password():
+    hasher = PasswordHasher(PasswordHashingConfig(rounds=4, max_concurrency=2))
+    pwd_hash = await hasher.hash("pwd_hash98B*")
+    assert pwd_hash.startswith("$2b$04$")
+    assert await hasher.check("pwd_hash98B*", pwd_hash)
+    assert not await hasher.check("wrong", pwd_hash)
+
+async def test_hashing_does_not_block_the_event_loop():
+    hasher = PasswordHasher(PasswordHashingConfig(rounds=10, max_concurrency=1))
+    ticks = 0
+    async def tick():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0)
+    ticker = asyncio.create_task(tick())
+    await hasher.hash("pwd_hash98B*")
+    ticker.cancel()
+    # The loop kept running other tasks while bcrypt was busy.
+    assert ticks > 1
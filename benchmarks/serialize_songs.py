@@ -0,0 +1,38 @@
+'''
+Per-page cost of serializing songs, the way `GET /api/songs` used to (jsonable_encoder + json) and does now (orjson).
+
+Run from the repository root: `python -m benchmarks.serialize_songs`
+'''
+import argparse
+import timeit
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from common.responses import OrjsonResponse
+from songs.entities import Song
+
+def make_page(size: int):
+    return [
+        Song(
+            idx, f'{idx:022d}', f'Song #{idx}', 3.5, 4, 0.521, 0.673, 8, -7.44, 1, 0.0324, 0.00011, 0.104, 0.542,
+            121.98, 225947, 4, 102, 9, 802, 1
+        )
+        for idx in range(size)
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--page_size', type=int, default=100)
+    parser.add_argument('--number', type=int, default=2000)
+    args = parser.parse_args()
+    page = make_page(args.page_size)
+    encoders = {
+        'jsonable_encoder + json': lambda: JSONResponse(None).render(jsonable_encoder(page)),
+        'orjson': lambda: OrjsonResponse(None).render(page),
+    }
+    assert len({encode() for encode in encoders.values()}) == 1, 'Encoders disagree on the output'
+    for name, encode in encoders.items():
+        seconds = min(timeit.repeat(encode, number=args.number, repeat=5)) / args.number
+        print(f'{name:<25} {seconds * 1e6:>9.1f} us / page of {args.page_size}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+'''
+Per-request overhead of `GET /api/songs` outside of SQLite's own work: validating the params, generating the SQL,
+and preparing the statement, which the per-connection statement cache skips for the query shapes it holds.
+
+Run from the repository root: `python -m benchmarks.songs_query_overhead`
+'''
+import argparse
+from dataclasses import fields
+from itertools import product
+import sqlite3
+import timeit
+from connection_pool import PoolConfig
+from migrations import migrate_connection
+from songs.dal.dal import _get_songs_query
+from songs.entities import Song
+from songs.validations import validate_get_songs_req
+
+def make_db(songs: int, cached_statements: int):
+    conn = sqlite3.connect(':memory:', cached_statements=cached_statements)
+    migrate_connection(conn)
+    conn.executemany(
+        'INSERT INTO songs (idx, id, title, tempo) VALUES (?, ?, ?, ?)',
+        [(idx, f'{idx:022d}', f'Song #{idx}', idx % 200) for idx in range(songs)]
+    )
+    conn.commit()
+    return conn
+
+def query_shapes():
+    '''
+    The distinct statements a busy server sees: every sort order, in both directions, on first and following pages,
+    with and without a title filter.
+    '''
+    return [
+        ('song' if title else None, order_by, order, (0, 0, '') if after else None)
+        for (title, order_by, order, after) in product([False, True], [f.name for f in fields(Song)], ['asc', 'desc'], [False, True])
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--songs', type=int, default=1000)
+    parser.add_argument('--number', type=int, default=20)
+    args = parser.parse_args()
+    shapes = query_shapes()
+
+    def build():
+        for (title, order_by, order, after) in shapes:
+            validate_get_songs_req(order_by, title)
+            _get_songs_query(title, 'user', order_by, order, 0, 1, after)
+
+    seconds = min(timeit.repeat(build, number=args.number, repeat=5)) / (args.number * len(shapes))
+    print(f'{"validate + build SQL":<32} {seconds * 1e6:>7.2f} us / request')
+    # Execution of a 1-song page, over the whole set of shapes, so preparing the statement dominates.
+    built = [_get_songs_query(title, 'user', order_by, order, 0, 1, after) for (title, order_by, order, after) in shapes]
+    for cached_statements in (0, 128, PoolConfig().statement_cache_size):
+        conn = make_db(args.songs, cached_statements)
+        def execute():
+            for (sql, values) in built:
+                conn.execute(sql, values).fetchall()
+        seconds = min(timeit.repeat(execute, number=args.number, repeat=5)) / (args.number * len(built))
+        print(f'{f"execute, cached_statements={cached_statements}":<32} {seconds * 1e6:>7.2f} us / request ({len(shapes)} shapes)')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,28 @@
+from typing import Any, Callable, Generic, TypeVar, Union
+
+C = TypeVar('C')
+
+class LazyConfig(Generic[C]):
+    '''
+    Descriptor of a config attribute that, when left as `None`, is read from the environment on first access.
+
+    Services are instantiated at import time, before `main` loads the `.env` file with `load_dotenv`,
+    so their configs are resolved on first use rather than in `__init__`.
+    '''
+    def __init__(self, from_env: Callable[[], C]) -> None:
+        self.from_env = from_env
+
+    def __set_name__(self, owner: type, name: str):
+        self.attr = f'_{name}'
+
+    def __get__(self, instance: Any, owner: Union[type, None] = None) -> C:
+        if instance is None:
+            return self # type: ignore
+        config = getattr(instance, self.attr, None)
+        if config is None:
+            config = self.from_env()
+            setattr(instance, self.attr, config)
+        return config
+
+    def __set__(self, instance: Any, config: Union[C, None]):
+        setattr(instance, self.attr, config)
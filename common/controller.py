@@ -0,0 +1,44 @@
+from fastapi import APIRouter, Response, status
+from fastapi.responses import JSONResponse
+from connection_pool import connection_pool
+from .metrics import render_prometheus, request_metrics
+from .readiness import readiness
+
+health_api = APIRouter(prefix='/health', tags=['Health API'])
+metrics_api = APIRouter(tags=['Metrics API'])
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+@health_api.get('/live')
+async def service_live():
+    return { 'live': True }
+
+@health_api.get('/ready')
+async def service_ready():
+    '''
+    Responds `503` while startup tasks (e.g. the playlist import) are running, and `200` once they are over.
+    The API serves requests in the meantime, off the data loaded so far.
+    '''
+    return JSONResponse(
+        readiness.to_dict(),
+        status_code=status.HTTP_200_OK if readiness.ready else status.HTTP_503_SERVICE_UNAVAILABLE
+    )
+
+@health_api.get('/pool')
+async def service_pool():
+    '''
+    Database pool metrics: size, checkouts, connections in use, and the time spent waiting for and holding connections.
+    '''
+    config = connection_pool.config
+    return {
+        'size': config.max_connections,
+        'acquire_timeout_ms': config.acquire_timeout_ms,
+        **{ kind: metrics.to_dict() for kind, metrics in connection_pool.metrics.items() }
+    }
+
+@metrics_api.get('/metrics')
+async def service_metrics():
+    '''
+    Request and database pool metrics, in the Prometheus text format. They're only rendered when scraped.
+    '''
+    return Response(render_prometheus(request_metrics, connection_pool.metrics), media_type=PROMETHEUS_CONTENT_TYPE)
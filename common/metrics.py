@@ -0,0 +1,147 @@
+from bisect import bisect_left
+from collections import defaultdict
+import time
+from typing import Any, Mapping, Sequence
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Upper bounds in seconds, from sub-millisecond SQLite lookups up to requests stuck behind a slow writer.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+class Histogram:
+    '''
+    Fixed-bucket histogram of observed values, e.g. durations in seconds.
+    `counts[i]` holds the observations up to `buckets[i]`, and the last count the ones above every bucket.
+    '''
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'buckets': { str(bound): count for bound, count in zip([*self.buckets, '+Inf'], self.counts) }
+        }
+
+# Route label of the requests that matched no route, e.g. 404s or the statically served frontend.
+UNMATCHED_ROUTE = 'unmatched'
+
+def route_template(scope: Scope) -> str:
+    '''
+    Template of the route that handled a request, e.g. `/api/songs/{song_idx}/{song_id}/rating`, which keeps label cardinality bounded.
+    The matched route's path may be relative to the prefixes it was included under, which are taken back from the request path.
+    '''
+    route = scope.get('route')
+    path = getattr(route, 'path', None)
+    if path is None:
+        return UNMATCHED_ROUTE
+    route_segments = path.split('/')[1:]
+    path_segments = scope['path'].split('/')[1:]
+    prefix = path_segments[:max(len(path_segments) - len(route_segments), 0)]
+    return '/' + '/'.join([*prefix, *route_segments])
+
+class RequestMetrics:
+    '''
+    Request counts and latencies per route template, plus the number of requests being served.
+    '''
+    def __init__(self) -> None:
+        self.in_flight = 0
+        self.requests: defaultdict[tuple[str, str, int], int] = defaultdict(int)
+        self.duration_seconds: defaultdict[tuple[str, str], Histogram] = defaultdict(Histogram)
+
+    def clear(self):
+        self.in_flight = 0
+        self.requests.clear()
+        self.duration_seconds.clear()
+
+request_metrics = RequestMetrics()
+
+class MetricsMiddleware:
+    '''
+    Pure ASGI middleware recording `RequestMetrics`: a few increments and a bucket lookup per request,
+    while rendering them is left to whoever scrapes `/metrics`.
+    '''
+    def __init__(self, app: ASGIApp, metrics: RequestMetrics = request_metrics) -> None:
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        status_code = 500
+        async def send_with_status(message: Message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+        metrics = self.metrics
+        metrics.in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            metrics.in_flight -= 1
+            # The router stored the matched route in the scope by now.
+            route = route_template(scope)
+            metrics.duration_seconds[(scope['method'], route)].observe(time.perf_counter() - started)
+            metrics.requests[(scope['method'], route, status_code)] += 1
+
+#region Prometheus text format
+def _escape(value: Any):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(**labels: Any):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+def _histogram_lines(name: str, histogram: Histogram, **labels: Any):
+    cumulative = 0
+    for bound, count in zip([*histogram.buckets, '+Inf'], histogram.counts):
+        cumulative += count
+        yield f'{name}_bucket{_labels(**labels, le=bound)} {cumulative}'
+    yield f'{name}_sum{_labels(**labels)} {histogram.sum}'
+    yield f'{name}_count{_labels(**labels)} {histogram.count}'
+
+def render_prometheus(metrics: RequestMetrics, pool_metrics: Mapping[str, Any]) -> str:
+    '''
+    Renders the request metrics, and the metrics of each kind of pooled connection (see `PoolMetrics`), in the Prometheus text format.
+    '''
+    lines = [
+        '# HELP http_requests_total Requests served, by route template and status code.',
+        '# TYPE http_requests_total counter',
+        *(f'http_requests_total{_labels(method=method, route=route, status=status)} {count}' for (method, route, status), count in metrics.requests.items()),
+        '# HELP http_request_duration_seconds Time to serve a request, by route template.',
+        '# TYPE http_request_duration_seconds histogram',
+        *(line for (method, route), histogram in metrics.duration_seconds.items() for line in _histogram_lines('http_request_duration_seconds', histogram, method=method, route=route)),
+        '# HELP http_requests_in_flight Requests being served.',
+        '# TYPE http_requests_in_flight gauge',
+        f'http_requests_in_flight {metrics.in_flight}',
+        '# HELP db_connection_checkouts_total Database connections checked out of the pool.',
+        '# TYPE db_connection_checkouts_total counter',
+        *(f'db_connection_checkouts_total{_labels(kind=kind)} {pool.checkouts}' for kind, pool in pool_metrics.items()),
+        '# HELP db_connection_timeouts_total Checkouts that gave up waiting for a free connection.',
+        '# TYPE db_connection_timeouts_total counter',
+        *(f'db_connection_timeouts_total{_labels(kind=kind)} {pool.timeouts}' for kind, pool in pool_metrics.items()),
+        '# HELP db_connections_in_use Database connections checked out right now.',
+        '# TYPE db_connections_in_use gauge',
+        *(f'db_connections_in_use{_labels(kind=kind)} {pool.in_use}' for kind, pool in pool_metrics.items()),
+        '# HELP db_connection_wait_seconds Time spent waiting for a free database connection.',
+        '# TYPE db_connection_wait_seconds histogram',
+        *(line for kind, pool in pool_metrics.items() for line in _histogram_lines('db_connection_wait_seconds', pool.wait_seconds, kind=kind)),
+        '# HELP db_connection_hold_seconds Time a database connection is held, i.e. spent querying, by DAL function.',
+        '# TYPE db_connection_hold_seconds histogram',
+        *(
+            line for kind, pool in pool_metrics.items() for site, histogram in pool.hold_seconds.items()
+            for line in _histogram_lines('db_connection_hold_seconds', histogram, kind=kind, site=site)
+        ),
+    ]
+    return '\n'.join(lines) + '\n'
+#endregion
@@ -0,0 +1,186 @@
+from asyncio import get_running_loop
+from concurrent.futures import ThreadPoolExecutor
+import cProfile
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import wraps
+import json
+import os
+import random
+import time
+from typing import Any, Awaitable, Callable, TypeVar, Union
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from .metrics import route_template
+
+PROFILE_HEADER = 'X-Profile'
+
+T = TypeVar('T')
+
+@dataclass
+class ProfilingConfig:
+    '''
+    Opt-in request profiling, configured through the `PROFILING_*` environment variables.
+    '''
+    enabled: bool = False
+    # Fraction of the requests profiled.
+    sample_rate: float = 0.01
+    # Requests sending this token in the `X-Profile` header are always profiled. Unset, the header is ignored.
+    header_token: Union[str, None] = None
+    # Whether sampled requests are also run under cProfile, whose stats are aggregated and dumped to `output_dir`.
+    cprofile: bool = False
+    output_dir: str = os.path.join('.', 'profiles')
+    # Span breakdowns are written to disk every `flush_every` sampled requests.
+    flush_every: int = 100
+
+    @staticmethod
+    def from_env():
+        defaults = ProfilingConfig()
+        return ProfilingConfig(
+            enabled=os.getenv('PROFILING_ENABLED', '0') == '1',
+            sample_rate=float(os.getenv('PROFILING_SAMPLE_RATE', defaults.sample_rate)),
+            header_token=os.getenv('PROFILING_HEADER_TOKEN') or None,
+            cprofile=os.getenv('PROFILING_CPROFILE', '0') == '1',
+            output_dir=os.getenv('PROFILING_OUTPUT_DIR', defaults.output_dir),
+            flush_every=int(os.getenv('PROFILING_FLUSH_EVERY', defaults.flush_every)),
+        )
+
+@dataclass
+class RequestProfile:
+    '''
+    Time spent in each span of a request, in seconds. Spans entered several times add up.
+    '''
+    spans: dict[str, float] = field(default_factory=dict)
+
+_current_profile: ContextVar[Union[RequestProfile, None]] = ContextVar('current_profile', default=None)
+
+@contextmanager
+def span(name: str):
+    '''
+    Times a step of the request being profiled, e.g. `with span('dal.query'): ...`. A no-op for requests that are not sampled.
+    '''
+    profile = _current_profile.get()
+    if profile is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.spans[name] = profile.spans.get(name, 0) + time.perf_counter() - started
+
+def timed(name: str):
+    '''
+    Decorator form of `span` for coroutine functions, e.g. FastAPI dependencies such as `verify_session`.
+    '''
+    def decorator(fn: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+        @wraps(fn)
+        async def wrapper(*args: Any, **kwargs: Any) -> T:
+            with span(name):
+                return await fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def _server_timing(spans: dict[str, float]):
+    return ', '.join(f'{name};dur={seconds * 1000:.3f}' for name, seconds in spans.items())
+
+class Profiler:
+    '''
+    Collects the span breakdowns of the sampled requests, and their aggregated cProfile stats if `cprofile` is on.
+    Files are written on a dedicated thread, so the event loop never blocks on disk I/O.
+    '''
+    def __init__(self, config: ProfilingConfig) -> None:
+        self.config = config
+        self.cprofile = cProfile.Profile() if config.cprofile else None
+        self.profiling = False
+        self._records: list[dict] = list()
+        # A single thread, so that writes land in order.
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='profiling')
+
+    def record(self, record: dict):
+        self._records.append(record)
+        if len(self._records) >= self.config.flush_every:
+            self._executor.submit(self._write_records, self._take_records())
+
+    def _take_records(self):
+        (records, self._records) = (self._records, list())
+        return records
+
+    def _write_records(self, records: list[dict]):
+        if not records:
+            return
+        os.makedirs(self.config.output_dir, exist_ok=True)
+        with open(os.path.join(self.config.output_dir, 'spans.jsonl'), 'a', encoding='utf-8') as f:
+            f.writelines(json.dumps(record) + '\n' for record in records)
+
+    def _dump_stats(self):
+        if self.cprofile is not None and self.cprofile.getstats():
+            os.makedirs(self.config.output_dir, exist_ok=True)
+            self.cprofile.dump_stats(os.path.join(self.config.output_dir, 'profile.prof'))
+
+    async def dump(self):
+        '''
+        Writes the span breakdowns recorded so far to `spans.jsonl`, and the aggregated cProfile stats to `profile.prof`.
+        '''
+        loop = get_running_loop()
+        await loop.run_in_executor(self._executor, self._write_records, self._take_records())
+        await loop.run_in_executor(self._executor, self._dump_stats)
+
+class ProfilingMiddleware:
+    '''
+    Pure ASGI middleware profiling a sample of the requests.
+
+    A sampled request gets the breakdown of its spans in a `Server-Timing` header, which is also recorded by the `Profiler`.
+    With `cprofile` on, sampled requests run under the profiler's shared cProfile, dumped to `profile.prof`
+    (readable by `pstats`, snakeviz or flameprof). The event loop is profiled as a whole while one of them is in flight,
+    so the stats of concurrent requests are mixed in, and overlapping sampled requests are not profiled twice.
+    '''
+    def __init__(self, app: ASGIApp, profiler: Profiler) -> None:
+        self.app = app
+        self.profiler = profiler
+        self.config = profiler.config
+
+    def _sampled(self, scope: Scope):
+        config = self.config
+        if config.header_token is not None and Headers(scope=scope).get(PROFILE_HEADER) == config.header_token:
+            return True
+        return random.random() < config.sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http' or not self._sampled(scope):
+            return await self.app(scope, receive, send)
+        profiler = self.profiler
+        profile = RequestProfile()
+        status_code = 500
+        started = time.perf_counter()
+        async def send_with_timing(message: Message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+                spans = { **profile.spans, 'total': time.perf_counter() - started }
+                message = { **message, 'headers': [*message.get('headers', []), (b'server-timing', _server_timing(spans).encode('latin-1'))] }
+            await send(message)
+        token = _current_profile.set(profile)
+        cprofile = profiler.cprofile if not profiler.profiling else None
+        if cprofile is not None:
+            try:
+                cprofile.enable()
+                profiler.profiling = True
+            except ValueError:
+                # Another profiler (e.g. a debugger's) is active.
+                cprofile = None
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            if cprofile is not None:
+                cprofile.disable()
+                profiler.profiling = False
+            _current_profile.reset(token)
+            profiler.record({
+                'method': scope['method'],
+                'route': route_template(scope),
+                'status': status_code,
+                'total': time.perf_counter() - started,
+                'spans': profile.spans,
+            })
@@ -0,0 +1,36 @@
+from dataclasses import asdict, dataclass
+from typing import Literal, Union
+
+@dataclass
+class StartupTask:
+    '''
+    Progress of a task run in the background after the server started accepting traffic, e.g. the playlist import.
+    '''
+    state: Literal['running', 'done', 'failed'] = 'running'
+    processed: int = 0
+    total: Union[int, None] = None
+    error: Union[str, None] = None
+
+class Readiness:
+    '''
+    Tracks background startup tasks. The server is ready once none of them is running anymore, whether they succeeded or not.
+    '''
+    def __init__(self) -> None:
+        self.tasks: dict[str, StartupTask] = dict()
+
+    def start(self, name: str):
+        task = StartupTask()
+        self.tasks[name] = task
+        return task
+
+    @property
+    def ready(self):
+        return all(task.state != 'running' for task in self.tasks.values())
+
+    def to_dict(self):
+        return {
+            'ready': self.ready,
+            'tasks': { name: asdict(task) for name, task in self.tasks.items() }
+        }
+
+readiness = Readiness()
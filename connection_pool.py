@@ -1,41 +1,276 @@
+from asyncio import Lock, Queue, get_running_loop, wait_for
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
+from dataclasses import dataclass
 import os
 from sqlite3 import Connection, connect
-from queue import Empty
-from asyncio import Queue
+import sys
+import time
+from typing import Any, Callable, Iterable, Literal, Sequence, TypeVar, Union
+from common.config import LazyConfig
+from common.metrics import Histogram
 DB_PATH = "./db/main.db"
 
+T = TypeVar('T')
+
+@dataclass
+class PoolConfig:
+    '''
+    Tunables of the SQLite connection pool.
+    Defaults can be overridden through the `DB_*` environment variables, see `PoolConfig.from_env`.
+    '''
+    # Number of read-only connections. Writes always go through a single dedicated writer connection.
+    max_connections: int = 5
+    journal_mode: str = 'WAL'
+    # NORMAL is durable under WAL except on power loss, and only fsyncs at checkpoints instead of on every commit.
+    synchronous: str = 'NORMAL'
+    # Negative values are in KiB, as per the SQLite `cache_size` pragma.
+    cache_size: int = -16000
+    mmap_size: int = 256 * 1024 * 1024
+    temp_store: str = 'MEMORY'
+    busy_timeout_ms: int = 5000
+    # Prepared statements kept per connection. Sized above the distinct statements of the DAL, i.e. every shape of the songs
+    # query, so the hot ones are never re-prepared.
+    statement_cache_size: int = 512
+    # How long a caller waits for a free connection before giving up with `PoolTimeoutError`.
+    acquire_timeout_ms: float = 2000
+
+    @staticmethod
+    def from_env():
+        defaults = PoolConfig()
+        return PoolConfig(
+            max_connections=int(os.getenv('DB_POOL_SIZE', defaults.max_connections)),
+            journal_mode=os.getenv('DB_JOURNAL_MODE', defaults.journal_mode),
+            synchronous=os.getenv('DB_SYNCHRONOUS', defaults.synchronous),
+            cache_size=int(os.getenv('DB_CACHE_SIZE', defaults.cache_size)),
+            mmap_size=int(os.getenv('DB_MMAP_SIZE', defaults.mmap_size)),
+            temp_store=os.getenv('DB_TEMP_STORE', defaults.temp_store),
+            busy_timeout_ms=int(os.getenv('DB_BUSY_TIMEOUT_MS', defaults.busy_timeout_ms)),
+            statement_cache_size=int(os.getenv('DB_STATEMENT_CACHE_SIZE', defaults.statement_cache_size)),
+            acquire_timeout_ms=float(os.getenv('DB_ACQUIRE_TIMEOUT_MS', defaults.acquire_timeout_ms)),
+        )
+
+    def pragmas(self, read_only: bool):
+        pragmas = [
+            f'PRAGMA busy_timeout = {int(self.busy_timeout_ms)}',
+            f'PRAGMA synchronous = {self.synchronous}',
+            f'PRAGMA cache_size = {int(self.cache_size)}',
+            f'PRAGMA mmap_size = {int(self.mmap_size)}',
+            f'PRAGMA temp_store = {self.temp_store}',
+        ]
+        if read_only:
+            pragmas.append('PRAGMA query_only = ON')
+        else:
+            # The journal mode is persisted in the DB file, so only the writer needs to set it.
+            pragmas.insert(0, f'PRAGMA journal_mode = {self.journal_mode}')
+        return pragmas
+
+#region Worker-thread helpers
+def _execute(conn: Connection, sql: str, params: Sequence[Any]):
+    return conn.execute(sql, params).rowcount
+
+def _executemany(conn: Connection, sql: str, seq_of_params: Iterable[Sequence[Any]]):
+    return conn.executemany(sql, seq_of_params).rowcount
+
+def _fetchall(conn: Connection, sql: str, params: Sequence[Any]):
+    return conn.execute(sql, params).fetchall()
+
+def _fetchone(conn: Connection, sql: str, params: Sequence[Any]):
+    return conn.execute(sql, params).fetchone()
+
+def _commit(conn: Connection):
+    conn.commit()
+#endregion
+
+class AsyncConnection:
+    '''
+    A `sqlite3.Connection` bound to a dedicated worker thread.
+    Every call is shipped to that thread and awaited, so DB work (queries, fsyncs) never blocks the event loop.
+    '''
+    def __init__(self, db_path: str, pragmas: Sequence[str] = (), cached_statements: int = 128) -> None:
+        self.db_path = db_path
+        self.pragmas = pragmas
+        self.cached_statements = cached_statements
+        self._conn: Union[Connection, None] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sqlite')
+
+    def _connect(self) -> Connection:
+        # Runs on the worker thread: the connection is opened lazily so that it is owned by that thread.
+        if self._conn is None:
+            conn = connect(self.db_path, cached_statements=self.cached_statements)
+            for pragma in self.pragmas:
+                conn.execute(pragma)
+            self._conn = conn
+        return self._conn
+
+    async def run(self, fn: Callable[..., T], *args: Any) -> T:
+        '''
+        Runs `fn(conn, *args)` on the worker thread with the underlying `sqlite3.Connection`.
+        Useful to group several statements into a single hop off the event loop.
+        '''
+        loop = get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: fn(self._connect(), *args))
+
+    async def execute(self, sql: str, params: Sequence[Any] = ()) -> int:
+        '''
+        Executes a statement and returns the number of affected rows.
+        '''
+        return await self.run(_execute, sql, params)
+
+    async def executemany(self, sql: str, seq_of_params: Iterable[Sequence[Any]]) -> int:
+        return await self.run(_executemany, sql, seq_of_params)
+
+    async def fetchall(self, sql: str, params: Sequence[Any] = ()) -> list[Any]:
+        return await self.run(_fetchall, sql, params)
+
+    async def fetchone(self, sql: str, params: Sequence[Any] = ()) -> Any:
+        return await self.run(_fetchone, sql, params)
+
+    async def commit(self):
+        await self.run(_commit)
+
+    async def close(self):
+        if self._conn is not None:
+            await self.run(lambda conn: conn.close())
+            self._conn = None
+        self._executor.shutdown(wait=False)
+
+class PoolTimeoutError(Exception):
+    '''
+    Raised when no connection frees up within `PoolConfig.acquire_timeout_ms`, i.e. the pool is starved.
+    '''
+    pass
+
+class PoolMetrics:
+    '''
+    Checkouts of one kind of connection (readers or the writer): how long callers wait for one, and how long they hold it,
+    per call site (the function checking it out), to tell pool starvation apart from slow queries.
+    '''
+    def __init__(self) -> None:
+        self.checkouts = 0
+        self.timeouts = 0
+        self.in_use = 0
+        self.wait_seconds = Histogram()
+        self.hold_seconds: defaultdict[str, Histogram] = defaultdict(Histogram)
+
+    def to_dict(self):
+        return {
+            'checkouts': self.checkouts,
+            'timeouts': self.timeouts,
+            'in_use': self.in_use,
+            'wait_seconds': self.wait_seconds.to_dict(),
+            'hold_seconds': { site: histogram.to_dict() for site, histogram in self.hold_seconds.items() }
+        }
+
+def _call_site(depth: int):
+    '''
+    Qualified name of the function `depth` frames above the caller.
+    '''
+    return sys._getframe(depth + 1).f_code.co_qualname
+
 class ConnectionPool:
-    def __init__(self, max_connections=5) -> None:
-        self.max_connections = max_connections
-        if not os.path.exists(DB_PATH):
+    '''
+    Single-writer / many-reader pool of SQLite connections.
+
+    Reads go through `connection()`, which hands out one of `max_connections` read-only connections.
+    Writes go through `writer()`, which serializes them on one connection: SQLite only ever allows one writer,
+    and with WAL enabled, readers are not blocked while it commits.
+    '''
+    config = LazyConfig(PoolConfig.from_env)
+
+    def __init__(self, config: Union[PoolConfig, None] = None, db_path=DB_PATH) -> None:
+        self.db_path = db_path
+        if not os.path.exists(self.db_path):
             print("Could not find the Database. Creating the DB from scratch using the provided file.")
-            self.create_db()  
-        self.pool: Queue[Connection] = self.populate_pool()
-    
+            self.create_db()
+        self.config = config
+        self.pool: Union[Queue[AsyncConnection], None] = None
+        self.writer_pool: Union[Queue[AsyncConnection], None] = None
+        self._init_lock = Lock()
+        self.metrics: dict[Literal['reader', 'writer'], PoolMetrics] = { 'reader': PoolMetrics(), 'writer': PoolMetrics() }
+
     def create_db(self):
-        with open(DB_PATH, "x") as f:
+        with open(self.db_path, "x") as f:
             f.close()
-    
-    def populate_pool(self):
-        pool = Queue(maxsize=self.max_connections)
-        for _ in range(self.max_connections):
-            conn = connect(DB_PATH)
+
+    def populate_pool(self, config: PoolConfig):
+        pool = Queue(maxsize=config.max_connections)
+        for _ in range(config.max_connections):
+            conn = AsyncConnection(self.db_path, config.pragmas(read_only=True), config.statement_cache_size)
             pool.put_nowait(conn)
         return pool
-    
-    async def get_connection(self):
-        return await self.pool.get()
-    
-    async def release(self, conn: Connection):
-        await self.pool.put(conn)
+
+    async def _ensure_pools(self):
+        if self.pool is not None and self.writer_pool is not None:
+            return
+        async with self._init_lock:
+            if self.pool is not None and self.writer_pool is not None:
+                return
+            writer = AsyncConnection(self.db_path, self.config.pragmas(read_only=False), self.config.statement_cache_size)
+            # Open the writer first, so the journal mode is switched before any reader connects.
+            await writer.run(lambda _: None)
+            writer_pool = Queue(maxsize=1)
+            writer_pool.put_nowait(writer)
+            self.writer_pool = writer_pool
+            self.pool = self.populate_pool(self.config)
+
+    async def _acquire(self, pool: 'Queue[AsyncConnection]', metrics: PoolMetrics, fail_fast: bool) -> AsyncConnection:
+        started = time.perf_counter()
+        if not pool.empty():
+            conn = pool.get_nowait()
+        elif not fail_fast:
+            conn = await pool.get()
+        else:
+            try:
+                conn = await wait_for(pool.get(), self.config.acquire_timeout_ms / 1000)
+            except TimeoutError:
+                metrics.timeouts += 1
+                raise PoolTimeoutError(f'No database connection freed up within {self.config.acquire_timeout_ms:g}ms.')
+        metrics.wait_seconds.observe(time.perf_counter() - started)
+        metrics.checkouts += 1
+        metrics.in_use += 1
+        return conn
 
     @asynccontextmanager
-    async def connection(self):
-        conn = await self.get_connection()
+    async def _checkout(self, kind: Literal['reader', 'writer'], site: str, fail_fast: bool = True):
+        await self._ensure_pools()
+        pool = self.pool if kind == 'reader' else self.writer_pool
+        assert pool is not None
+        metrics = self.metrics[kind]
+        conn = await self._acquire(pool, metrics, fail_fast)
+        acquired = time.perf_counter()
         try:
             yield conn
         finally:
-            await self.release(conn)
+            metrics.in_use -= 1
+            metrics.hold_seconds[site].observe(time.perf_counter() - acquired)
+            pool.put_nowait(conn)
+
+    def connection(self, site: Union[str, None] = None):
+        '''
+        Checks out a read-only connection. Its hold time is recorded under `site`, by default the calling function.
+
+        :raises PoolTimeoutError: If none frees up within `acquire_timeout_ms`.
+        '''
+        return self._checkout('reader', site or _call_site(1))
+
+    def writer(self, site: Union[str, None] = None, fail_fast: bool = True):
+        '''
+        Checks out the single writer connection. Callers queue up behind each other.
+        Background writes (rating flushes, playlist imports) pass `fail_fast=False` to wait as long as it takes,
+        as there is no client to answer with a `503`.
+
+        :raises PoolTimeoutError: If `fail_fast` and it does not free up within `acquire_timeout_ms`.
+        '''
+        return self._checkout('writer', site or _call_site(1), fail_fast)
+
+    async def close(self):
+        for pool in (self.pool, self.writer_pool):
+            while pool is not None and not pool.empty():
+                conn = pool.get_nowait()
+                await conn.close()
+        self.pool = None
+        self.writer_pool = None
 
 connection_pool = ConnectionPool()
@@ -1,4 +1,3 @@
---#region Setup Tables
 CREATE TABLE IF NOT EXISTS songs
  (
 	idx INTEGER,
@@ -54,43 +53,3 @@ CREATE TABLE IF NOT EXISTS sessions (
 	expires_at TIMESTAMP,
 	FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
 );
-
---#endregion
---#region Setup Triggers
-CREATE TRIGGER pre_update_rating
-BEFORE UPDATE ON ratings
-FOR EACH ROW
-BEGIN
-	UPDATE avg_ratings
-	SET
-		sum_ratings = sum_ratings - OLD.rating,
-		n_ratings = n_ratings - 1,
-		avg_rating = ROUND((sum_ratings - OLD.rating) / (n_ratings - 1), 2)
-	WHERE song_idx = OLD.song_idx AND song_id = OLD.song_id;
-END;
-
-CREATE TRIGGER post_insert_rating
-AFTER INSERT ON ratings
-FOR EACH ROW
-BEGIN
-	INSERT INTO avg_ratings (song_idx, song_id, n_ratings, sum_ratings, avg_rating)
-	VALUES (NEW.song_idx, NEW.song_id, 1, NEW.rating, NEW.rating)
-	ON CONFLICT (song_idx, song_id) DO 
-	UPDATE SET 
-		n_ratings = n_ratings + excluded.n_ratings,
-		sum_ratings = sum_ratings + excluded.sum_ratings,
-		avg_rating = ROUND((sum_ratings + excluded.sum_ratings) / (n_ratings + excluded.n_ratings), 2);
-END;
-
-CREATE TRIGGER post_update_rating
-AFTER UPDATE ON ratings
-FOR EACH ROW
-BEGIN
-	UPDATE avg_ratings
-	SET
-		sum_ratings = sum_ratings + NEW.rating,
-		n_ratings = n_ratings + 1,
-		avg_rating = ROUND((sum_ratings + NEW.rating) / (n_ratings + 1), 2)
-	WHERE song_idx = NEW.song_idx AND song_id = NEW.song_id;
-END;
---#endregion
@@ -0,0 +1,13 @@
+-- Every song gets an avg_ratings row, so ordering by rating can be read straight off avg_ratings_avg_rating_idx.
+CREATE TRIGGER IF NOT EXISTS post_insert_song
+AFTER INSERT ON songs
+FOR EACH ROW
+BEGIN
+	INSERT OR IGNORE INTO avg_ratings (song_idx, song_id, n_ratings, sum_ratings, avg_rating)
+	VALUES (NEW.idx, NEW.id, 0, 0, 0);
+END;
+
+INSERT OR IGNORE INTO avg_ratings (song_idx, song_id, n_ratings, sum_ratings, avg_rating)
+SELECT idx, id, 0, 0, 0 FROM songs;
+
+CREATE INDEX IF NOT EXISTS avg_ratings_avg_rating_idx ON avg_ratings (avg_rating, song_idx, song_id);
@@ -0,0 +1,33 @@
+-- External-content FTS5 index over songs.title, kept in sync by triggers.
+-- It is keyed on the implicit songs.rowid: rebuild it after a VACUUM, which may renumber rowids.
+CREATE VIRTUAL TABLE IF NOT EXISTS songs_fts USING fts5(
+	title,
+	content='songs',
+	content_rowid='rowid',
+	tokenize='unicode61 remove_diacritics 2',
+	prefix='2 3'
+);
+
+CREATE TRIGGER IF NOT EXISTS songs_fts_after_insert
+AFTER INSERT ON songs
+FOR EACH ROW
+BEGIN
+	INSERT INTO songs_fts (rowid, title) VALUES (NEW.rowid, NEW.title);
+END;
+
+CREATE TRIGGER IF NOT EXISTS songs_fts_after_delete
+AFTER DELETE ON songs
+FOR EACH ROW
+BEGIN
+	INSERT INTO songs_fts (songs_fts, rowid, title) VALUES ('delete', OLD.rowid, OLD.title);
+END;
+
+CREATE TRIGGER IF NOT EXISTS songs_fts_after_update
+AFTER UPDATE OF title ON songs
+FOR EACH ROW
+BEGIN
+	INSERT INTO songs_fts (songs_fts, rowid, title) VALUES ('delete', OLD.rowid, OLD.title);
+	INSERT INTO songs_fts (rowid, title) VALUES (NEW.rowid, NEW.title);
+END;
+
+INSERT INTO songs_fts (songs_fts) VALUES ('rebuild');
@@ -0,0 +1,9 @@
+-- Hash of each song's attributes, so a re-import only rewrites the songs that changed.
+ALTER TABLE songs ADD COLUMN content_hash VARCHAR;
+
+-- Hash of every imported playlist file, so an unchanged file is not imported again.
+CREATE TABLE IF NOT EXISTS playlist_imports (
+	path VARCHAR PRIMARY KEY,
+	content_hash VARCHAR NOT NULL,
+	imported_at INTEGER NOT NULL
+);
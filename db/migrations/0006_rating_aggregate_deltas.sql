@@ -0,0 +1,27 @@
+-- A rating change is applied to avg_ratings as a single delta, instead of being removed then re-added by two triggers.
+DROP TRIGGER IF EXISTS pre_update_rating;
+DROP TRIGGER IF EXISTS post_update_rating;
+
+CREATE TRIGGER IF NOT EXISTS post_update_rating_delta
+AFTER UPDATE OF rating ON ratings
+FOR EACH ROW
+WHEN NEW.rating IS NOT OLD.rating
+BEGIN
+	UPDATE avg_ratings
+	SET
+		sum_ratings = sum_ratings + NEW.rating - OLD.rating,
+		avg_rating = ROUND((sum_ratings + NEW.rating - OLD.rating) / n_ratings, 2)
+	WHERE song_idx = NEW.song_idx AND song_id = NEW.song_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS post_delete_rating
+AFTER DELETE ON ratings
+FOR EACH ROW
+BEGIN
+	UPDATE avg_ratings
+	SET
+		sum_ratings = sum_ratings - OLD.rating,
+		n_ratings = n_ratings - 1,
+		avg_rating = COALESCE(ROUND((sum_ratings - OLD.rating) / (n_ratings - 1), 2), 0)
+	WHERE song_idx = OLD.song_idx AND song_id = OLD.song_id;
+END;
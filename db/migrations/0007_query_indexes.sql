@@ -0,0 +1,23 @@
+-- Every sortable column of songs is indexed along with the (idx, id) tiebreaker, so ORDER BY ... LIMIT pages, and keyset
+-- cursors, are read straight off the index instead of sorting the whole table.
+CREATE INDEX IF NOT EXISTS songs_title_idx ON songs (title, idx, id);
+CREATE INDEX IF NOT EXISTS songs_danceability_idx ON songs (danceability, idx, id);
+CREATE INDEX IF NOT EXISTS songs_energy_idx ON songs (energy, idx, id);
+CREATE INDEX IF NOT EXISTS songs_key_idx ON songs (key, idx, id);
+CREATE INDEX IF NOT EXISTS songs_loudness_idx ON songs (loudness, idx, id);
+CREATE INDEX IF NOT EXISTS songs_mode_idx ON songs (mode, idx, id);
+CREATE INDEX IF NOT EXISTS songs_acousticness_idx ON songs (acousticness, idx, id);
+CREATE INDEX IF NOT EXISTS songs_instrumentalness_idx ON songs (instrumentalness, idx, id);
+CREATE INDEX IF NOT EXISTS songs_liveness_idx ON songs (liveness, idx, id);
+CREATE INDEX IF NOT EXISTS songs_valence_idx ON songs (valence, idx, id);
+CREATE INDEX IF NOT EXISTS songs_tempo_idx ON songs (tempo, idx, id);
+CREATE INDEX IF NOT EXISTS songs_duration_ms_idx ON songs (duration_ms, idx, id);
+CREATE INDEX IF NOT EXISTS songs_time_signature_idx ON songs (time_signature, idx, id);
+CREATE INDEX IF NOT EXISTS songs_num_bars_idx ON songs (num_bars, idx, id);
+CREATE INDEX IF NOT EXISTS songs_num_sections_idx ON songs (num_sections, idx, id);
+CREATE INDEX IF NOT EXISTS songs_num_segments_idx ON songs (num_segments, idx, id);
+CREATE INDEX IF NOT EXISTS songs_class_idx ON songs (class, idx, id);
+
+-- Expired sessions cleanup, and a user's own ratings.
+CREATE INDEX IF NOT EXISTS sessions_expires_at_idx ON sessions (expires_at);
+CREATE INDEX IF NOT EXISTS ratings_user_id_idx ON ratings (user_id);
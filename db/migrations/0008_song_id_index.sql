@@ -0,0 +1,2 @@
+-- Sorting on the song id was left out of 0007_query_indexes, and sorted the whole table on every page.
+CREATE INDEX IF NOT EXISTS songs_id_idx ON songs (id, idx);
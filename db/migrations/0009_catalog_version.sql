@@ -0,0 +1,51 @@
+-- Version of everything a songs page shows, bumped in the same transaction as any write to songs or ratings, whichever process makes it.
+-- Rating writes always reach avg_ratings through the rating triggers, so triggers on songs and avg_ratings cover every write.
+-- Seeded at random, so ETags issued against a database that was since recreated never validate.
+CREATE TABLE IF NOT EXISTS catalog_version (
+	id INTEGER PRIMARY KEY CHECK (id = 0),
+	version INTEGER NOT NULL
+);
+
+INSERT OR IGNORE INTO catalog_version (id, version) VALUES (0, ABS(RANDOM() % 1000000000));
+
+CREATE TRIGGER IF NOT EXISTS catalog_version_after_song_insert
+AFTER INSERT ON songs
+FOR EACH ROW
+BEGIN
+	UPDATE catalog_version SET version = version + 1 WHERE id = 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS catalog_version_after_song_update
+AFTER UPDATE ON songs
+FOR EACH ROW
+BEGIN
+	UPDATE catalog_version SET version = version + 1 WHERE id = 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS catalog_version_after_song_delete
+AFTER DELETE ON songs
+FOR EACH ROW
+BEGIN
+	UPDATE catalog_version SET version = version + 1 WHERE id = 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS catalog_version_after_avg_rating_insert
+AFTER INSERT ON avg_ratings
+FOR EACH ROW
+BEGIN
+	UPDATE catalog_version SET version = version + 1 WHERE id = 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS catalog_version_after_avg_rating_update
+AFTER UPDATE ON avg_ratings
+FOR EACH ROW
+BEGIN
+	UPDATE catalog_version SET version = version + 1 WHERE id = 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS catalog_version_after_avg_rating_delete
+AFTER DELETE ON avg_ratings
+FOR EACH ROW
+BEGIN
+	UPDATE catalog_version SET version = version + 1 WHERE id = 0;
+END;
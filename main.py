@@ -1,3 +1,4 @@
+import asyncio
 from contextlib import asynccontextmanager
 import json
 import logging
@@ -10,12 +11,16 @@ from starlette.exceptions import HTTPException
 import argparse
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
-from pydantic import ValidationError
 from auth.business.constants import SESSION_ID_COOKIE
 from common.entities import ErrorResponse
-from songs.entities import PlaylistInput
-from startup_utils import add_middlewares, validate_json_file, add_startup_arguments, register_routes
-from songs.business import load_playlist
+from common.readiness import readiness
+from songs.entities import PlaylistFormatError
+from startup_utils import add_middlewares, add_startup_arguments, register_routes
+from songs.business import import_playlist
+from connection_pool import PoolConfig, PoolTimeoutError, connection_pool
+from migrations import migrate
+from query_plans import warn_on_query_plans
+from songs.dal import rating_write_queue
 
 load_dotenv()
 
@@ -23,25 +28,43 @@ ENV = os.getenv("ENV")
 LAUNCHER = os.getenv("LAUNCHER")
 vite_process = None
 
-async def load_playlist_data(playlist_path: Union[str, None]):
+async def load_playlist_data(playlist_path: Union[str, None], batch_size: int, max_in_memory_mb: int, import_mode: str):
     if playlist_path:
         exists = os.path.exists(playlist_path)
         if not exists:
             print("The specified path to playlist does not exist on the server. Proceeding without any data loading.")
             return
-        with open(playlist_path, 'r') as f:
-            try:
-                playlist: PlaylistInput = json.load(f)
-                validate_json_file(playlist)
-                await load_playlist(playlist)
-            except json.JSONDecodeError as jde:
-                print(f"Error: Unable to decode JSON: {jde}")
-                print("Continuing without loading any data")
-            except ValidationError as ve:
-                print(f"The given JSON was not valid: {ve}")
-                print("Continuing without loading any data")
-            except Exception as e:
-                print(f"An unknown error occured {e}.\nContinuing without loading any data.")
+        task = readiness.start("playlist_import")
+        def on_progress(processed: int, total: int):
+            previous = task.processed
+            task.processed, task.total = processed, total
+            # Logged every 10%.
+            if processed * 10 // total != previous * 10 // total:
+                print(f"Imported {processed}/{total} songs from {playlist_path}.")
+        try:
+            result = await import_playlist(
+                playlist_path, batch_size, max_in_memory_mb << 20, import_mode == "incremental", on_progress
+            )
+            task.state = "done"
+            if result.mode == "unchanged":
+                print(f"{playlist_path} is unchanged since its last import. Skipping data loading.")
+            else:
+                print(f"Loaded {result.songs} songs ({result.changed} new or changed) from {playlist_path} in {result.seconds:.2f}s ({result.rows_per_second:,.0f} rows/s, {result.mode}).")
+        except json.JSONDecodeError as jde:
+            task.state, task.error = "failed", f"Unable to decode JSON: {jde}"
+            print(f"Error: Unable to decode JSON: {jde}")
+            print("Continuing without loading any data")
+        except PlaylistFormatError as pfe:
+            task.state, task.error = "failed", f"The given JSON was not valid: {pfe}"
+            print(f"The given JSON was not valid: {pfe}")
+            print("Continuing without loading any data")
+        except Exception as e:
+            task.state, task.error = "failed", str(e)
+            print(f"An unknown error occured {e}.\nContinuing without loading any data.")
+        finally:
+            # Cancelled on shutdown.
+            if task.state == "running":
+                task.state = "failed"
     else:
         print("No file specified to load playlist data into the database. Proceeding without any data loading.")
 
@@ -50,17 +73,38 @@ parser = argparse.ArgumentParser(description="Web server for VivPro Songs")
 args = add_startup_arguments(parser)
 
 # Setup Modules
-async def setup_modules(app: FastAPI, playlist_path: Union[str, None]):
-    # pre-load data
-    await load_playlist_data(playlist_path)
-    # Setup routes
+def setup_modules(app: FastAPI):
+    # Routes are registered up front, so the API serves requests while the playlist is imported.
     register_routes(app, ENV)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Setup modules across the application
-    await setup_modules(app, args.playlist_path)
+    # CLI flags take precedence over the `DB_*` environment variables.
+    pool_config = PoolConfig.from_env()
+    if args.db_pool_size is not None:
+        pool_config.max_connections = args.db_pool_size
+    if args.db_acquire_timeout_ms is not None:
+        pool_config.acquire_timeout_ms = args.db_acquire_timeout_ms
+    connection_pool.config = pool_config
+    # Bring the schema up to date before serving anything, e.g. to provision a fresh database.
+    applied = await migrate()
+    if applied:
+        print(f"Applied database migrations {applied}.")
+    if ENV == "dev":
+        # Flags the DAL statements that read a whole table, against the dev database's schema and statistics.
+        await warn_on_query_plans()
+    # Import the playlist in the background. `/api/health/ready` reports its progress, and flips once it's over.
+    import_task = asyncio.create_task(load_playlist_data(
+        args.playlist_path, args.playlist_batch_size, args.playlist_max_in_memory_mb, args.playlist_import_mode
+    ))
     yield
+    import_task.cancel()
+    await asyncio.gather(import_task, return_exceptions=True)
+    await rating_write_queue.close()
+    await connection_pool.close()
+    profiler = getattr(app.state, "profiler", None)
+    if profiler:
+        await profiler.dump()
     if ENV == "dev" and LAUNCHER != "vs_code" and vite_process:
         print("Closing Vite server")
         vite_process.terminate()
@@ -68,6 +112,8 @@ async def lifespan(app: FastAPI):
 app = FastAPI(lifespan=lifespan)
 # Add middlewares
 add_middlewares(app, ENV)
+# Setup modules across the application
+setup_modules(app)
 
 #region Exception Handlers
 @app.exception_handler(RequestValidationError)
@@ -97,6 +143,15 @@ async def http_exception_handler(req: Request, ex: HTTPException):
         res.delete_cookie(SESSION_ID_COOKIE)
     return res
 
+@app.exception_handler(PoolTimeoutError)
+async def pool_timeout_handler(req: Request, ex: PoolTimeoutError):
+    # The pool is starved: fail fast, rather than queueing up more requests behind it.
+    return JSONResponse(
+        ErrorResponse(status.HTTP_503_SERVICE_UNAVAILABLE, "The server is overloaded, please retry.").__dict__,
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={"Retry-After": "1"}
+    )
+
 @app.exception_handler(Exception)
 async def unhandled_exception_handler(request: Request, exc: Exception):
     logging.log(3, exc)
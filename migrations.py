@@ -0,0 +1,47 @@
+import os
+import re
+from sqlite3 import Connection
+from connection_pool import ConnectionPool, connection_pool
+
+MIGRATIONS_DIR = os.path.join(".", "db", "migrations")
+
+_MIGRATION_FILE = re.compile(r'^(\d+)_(\w+)\.sql$')
+
+def list_migrations(migrations_dir: str = MIGRATIONS_DIR) -> list[tuple[int, str]]:
+    '''
+    Returns the `(version, path)` of the migration scripts, named `<version>_<name>.sql`, in the order they apply.
+    '''
+    migrations: list[tuple[int, str]] = list()
+    for file_name in os.listdir(migrations_dir):
+        match = _MIGRATION_FILE.match(file_name)
+        if match:
+            migrations.append((int(match.group(1)), os.path.join(migrations_dir, file_name)))
+    return sorted(migrations)
+
+def migrate_connection(conn: Connection, migrations_dir: str = MIGRATIONS_DIR) -> list[int]:
+    '''
+    Applies the migrations newer than the database's `user_version`, each in its own transaction along with the version bump,
+    so a failing migration leaves the database at the previous version. Returns the versions applied.
+    '''
+    (current,) = conn.execute('PRAGMA user_version').fetchone()
+    applied: list[int] = list()
+    for version, path in list_migrations(migrations_dir):
+        if version <= current:
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            script = f.read()
+        try:
+            conn.executescript(f'BEGIN;\n{script}\nPRAGMA user_version = {version};\nCOMMIT;')
+        except Exception:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        applied.append(version)
+    return applied
+
+async def migrate(pool: ConnectionPool = connection_pool, migrations_dir: str = MIGRATIONS_DIR) -> list[int]:
+    '''
+    Brings the database schema up to date on the writer connection. Returns the versions applied.
+    '''
+    async with pool.writer(fail_fast=False) as conn:
+        return await conn.run(migrate_connection, migrations_dir)
@@ -0,0 +1,64 @@
+from dataclasses import dataclass
+from sqlite3 import Connection
+from typing import Any, Iterable, Sequence, Union
+from connection_pool import ConnectionPool, connection_pool
+
+@dataclass(frozen=True)
+class RegisteredQuery:
+    '''
+    A DAL statement whose query plan is guarded, along with representative parameters to plan it with.
+    '''
+    name: str
+    sql: str
+    params: Sequence[Any] = ()
+    # Prefixes of the plan steps that are expected despite being flagged, e.g. the ordered index walk of a paginated query.
+    allow: tuple[str, ...] = ()
+
+_registry: dict[str, RegisteredQuery] = dict()
+
+def register_query(name: str, sql: str, params: Sequence[Any] = (), allow: Iterable[str] = ()):
+    '''
+    Registers a DAL statement for `check_query_plans`. Returns `sql`, so statements can be registered where they're defined.
+    '''
+    _registry[name] = RegisteredQuery(name, sql, tuple(params), tuple(allow))
+    return sql
+
+def registered_queries() -> list[RegisteredQuery]:
+    return list(_registry.values())
+
+def _is_flagged(detail: str):
+    '''
+    Whether a plan step reads a whole table: a `SCAN` of a table or an index, or a sort of the rows in a temporary B-tree.
+    Virtual tables (e.g. an FTS `MATCH`) do their own lookups, and `VALUES` lists are no tables: neither is flagged.
+    '''
+    if detail.startswith('USE TEMP B-TREE'):
+        return True
+    return detail.startswith('SCAN ') and 'VIRTUAL TABLE' not in detail and 'CONSTANT ROW' not in detail
+
+def explain_query_plan(conn: Connection, query: RegisteredQuery) -> list[str]:
+    return [detail for (_, _, _, detail) in conn.execute(f'EXPLAIN QUERY PLAN {query.sql}', query.params)]
+
+def check_query_plans(conn: Connection, queries: Union[Iterable[RegisteredQuery], None] = None) -> dict[str, list[str]]:
+    '''
+    Plans every registered statement (or `queries`) against the schema of `conn`,
+    and returns the flagged plan steps that are not allowed, by statement name.
+    '''
+    problems: dict[str, list[str]] = dict()
+    for query in registered_queries() if queries is None else queries:
+        flagged = [
+            detail for detail in explain_query_plan(conn, query)
+            if _is_flagged(detail) and not detail.startswith(query.allow)
+        ]
+        if flagged:
+            problems[query.name] = flagged
+    return problems
+
+async def warn_on_query_plans(pool: ConnectionPool = connection_pool):
+    '''
+    Prints the statements whose plan regressed to a full scan, against the live database. Meant for dev mode.
+    '''
+    async with pool.connection() as conn:
+        problems = await conn.run(check_query_plans)
+    for name, details in problems.items():
+        print(f"Warning: the query plan of {name} reads a whole table: {'; '.join(details)}")
+    return problems
@@ -1,3 +1,3 @@
-from .business import load_playlist, get_songs, rate_song, get_song_by_idx_id
+from .business import import_playlist, get_songs, rate_song, get_catalog_version
 
-__all__ = ['load_playlist', 'get_songs', 'rate_song', 'get_song_by_idx_id']
\ No newline at end of file
+__all__ = ['import_playlist', 'get_songs', 'rate_song', 'get_catalog_version']
\ No newline at end of file
@@ -1,61 +1,103 @@
-from typing import Literal, Union
-from songs.dal import insert_songs, get_songs as get_songs_dl, get_song_ratings, rate_song as rate_song_dl, get_song_by_idx_id as get_song_by_idx_id_dl
-from songs.entities import PlaylistInput
-from songs.entities import Song
+import asyncio
+import hashlib
+import json
+import os
+import time
+from typing import Any, Callable, Iterable, Iterator, Literal, Sequence, Union
+from songs.dal import upsert_song_rows, get_playlist_import_hash, record_playlist_import, PlaylistStaging, STAGED_COLUMNS, get_songs as get_songs_dl, rate_song as rate_song_dl, get_catalog_version as get_catalog_version_dl
+from songs.entities import PlaylistFormatError, PlaylistImport
+from songs.pagination import KeysetPosition
+from .playlist_columns import iter_rows, to_columns
+from .playlist_stream import iter_playlist_columns
 
 
-async def load_playlist(playlist: PlaylistInput):
+# Columns of the imported rows: the playlist's, then the hash of each song's values.
+SONG_COLUMNS = [*STAGED_COLUMNS, 'content_hash']
+
+def _with_content_hash(rows: Iterable[Sequence[Any]]) -> Iterator[tuple[Any, ...]]:
+    for row in rows:
+        yield (*row, hashlib.blake2b(repr(tuple(row)).encode(), digest_size=16).hexdigest())
+
+def _hash_file(path: str):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(1 << 20):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _read_playlist(playlist_path: str):
+    with open(playlist_path, 'r', encoding='utf-8') as f:
+        playlist = json.load(f)
+    if not isinstance(playlist, dict):
+        raise PlaylistFormatError('The playlist must be an object of column -> entries.')
+    return to_columns(playlist)
+
+async def import_playlist(
+    playlist_path: str,
+    batch_size: int = 5000,
+    max_in_memory_bytes: int = 64 << 20,
+    incremental: bool = True,
+    on_progress: Union[Callable[[int, int], None], None] = None
+):
     '''
-    Maps playlist data to songs.
+    Imports a playlist file into the database. New songs are inserted, and existing ones are only rewritten if they changed.
+    If `incremental`, a file identical to the last one imported from the same path is skipped altogether.
+
+    Files of up to `max_in_memory_bytes` take the fast path: parsed at once, and converted into typed columns off the event loop.
+    Larger files are streamed in bounded memory: parsed incrementally and pivoted from columns to rows in a staging DB,
+    `batch_size` values at a time.
+    Either way, songs are upserted in batches of `batch_size` rows, each in its own transaction, so other writes are not held up
+    for the whole import. `on_progress(songs_written, songs_total)` is called after every batch.
+
+    :raises json.JSONDecodeError: If the file is not valid JSON.
+    :raises PlaylistFormatError: If the file does not follow the `PlaylistInput` format.
     '''
-    songs: list[Song] = list()
-    playlist_dict = dict(playlist)
-    for idx in playlist_dict['id'].keys():
-        song = Song(
-            id=str(playlist_dict['id'][idx]),
-            title=str(playlist_dict['title'][idx]),
-            idx=int(idx),
-            duration=int(playlist_dict['duration_ms'][idx]),
-            time_signature=int(playlist_dict['time_signature'][idx]),
-            num_segments=int(playlist_dict['num_segments'][idx]),
-            num_bars=int(playlist_dict['num_bars'][idx]),
-            num_sections=int(playlist_dict['num_sections'][idx]),
-            song_class=int(playlist_dict['class'][idx]),
-            acousticness=float(playlist_dict['acousticness'][idx]),
-            danceability=float(playlist_dict['danceability'][idx]),
-            energy=float(playlist_dict['energy'][idx]),
-            instrumentalness=float(playlist_dict['instrumentalness'][idx]),
-            liveness=float(playlist_dict['liveness'][idx]),
-            key=float(playlist_dict['key'][idx]),
-            loudness=float(playlist_dict['loudness'][idx]),
-            mode=float(playlist_dict['mode'][idx]),
-            tempo=float(playlist_dict['tempo'][idx]),
-            valence=float(playlist_dict['valence'][idx]),
-            rating=0,
-            user_rating=0
-            )
-        songs.append(song)
-    await insert_songs(songs)
-
-async def get_songs(title: Union[str, None], user_id:str = '', order_by: str = 'idx', order: Literal['asc', 'desc'] = 'asc', offset: int = 0, limit: int = 10):
-    order_by_rating = order_by == 'rating' or order_by == 'user_rating'
-    if order_by_rating:
-        # Joined column
-        order_by = 'idx'
-    songs = await get_songs_dl(title, order_by, order, offset, limit)
-    if songs:
-        song_mapping = await get_song_ratings([(song.idx, song.id) for song in songs], user_id)
-        for song in songs:
-            mapping_key = f'{song.id}_{song.idx}'
-            if mapping_key in song_mapping:
-                song.rating = song_mapping[mapping_key]['avg_rating']
-                song.user_rating = song_mapping[mapping_key]['user_rating']
-    if order_by_rating:
-        songs.sort(key= lambda x : (x.rating, x.user_rating), reverse=order == 'desc')
-    return songs
+    start = time.perf_counter()
+    path = os.path.realpath(playlist_path)
+    file_hash = await asyncio.to_thread(_hash_file, path)
+    if incremental and await get_playlist_import_hash(path) == file_hash:
+        return PlaylistImport(0, 0, time.perf_counter() - start, 'unchanged')
+    if os.path.getsize(path) <= max_in_memory_bytes:
+        names, columns = await asyncio.to_thread(_read_playlist, path)
+        count = len(columns[0])
+        changed = 0
+        for offset in range(0, count, batch_size):
+            # Slicing a typed array is a plain memory copy. Rows are still built, and hashed, lazily on the writer's thread.
+            batch = [column[offset:offset + batch_size] for column in columns]
+            changed += await upsert_song_rows([*names, 'content_hash'], _with_content_hash(iter_rows(batch)))
+            if on_progress:
+                on_progress(min(offset + batch_size, count), count)
+        result = PlaylistImport(count, changed, time.perf_counter() - start, 'in_memory')
+    else:
+        changed = 0
+        written = 0
+        with open(path, 'r', encoding='utf-8') as f:
+            async with PlaylistStaging() as staging:
+                count = await staging.stage(iter_playlist_columns(f), batch_size)
+                async for rows in staging.rows(batch_size):
+                    changed += await upsert_song_rows(SONG_COLUMNS, _with_content_hash(rows))
+                    written += len(rows)
+                    if on_progress:
+                        on_progress(written, count)
+        result = PlaylistImport(count, changed, time.perf_counter() - start, 'streaming')
+    # Recorded last, so that a failed import is retried on the next start.
+    await record_playlist_import(path, file_hash, int(time.time()))
+    return result
+
+async def get_songs(
+    title: Union[str, None],
+    user_id:str = '',
+    order_by: str = 'idx',
+    order: Literal['asc', 'desc'] = 'asc',
+    offset: int = 0,
+    limit: int = 10,
+    after: Union[KeysetPosition, None] = None,
+    search: Union[str, None] = None
+):
+    return await get_songs_dl(title, user_id, order_by, order, offset, limit, after, search)
 
 async def rate_song(song_idx: int, song_id: str, user_id: str, rating: float):
     return await rate_song_dl(song_idx, song_id, user_id, rating)
 
-async def get_song_by_idx_id(idx: int, id: str):
-    return await get_song_by_idx_id_dl(idx, id)
\ No newline at end of file
+async def get_catalog_version():
+    return await get_catalog_version_dl()
\ No newline at end of file
@@ -0,0 +1,60 @@
+from array import array
+from typing import Any, Iterable, Iterator, Mapping, Sequence
+from songs.entities import PlaylistFormatError, PLAYLIST_COLUMN_TYPES
+from .playlist_stream import convert_value, to_idx
+
+# Typed array code of the numeric columns: 8-byte floats and signed 8-byte ints.
+_TYPECODES: dict[type, str] = { float: 'd', int: 'q' }
+
+def _to_column(column: str, values: Iterable[Any]) -> Sequence[Any]:
+    '''
+    Converts a whole column at once, into a typed array for numbers and a list for strings.
+    '''
+    values = list(values)
+    expected_type = PLAYLIST_COLUMN_TYPES[column]
+    if expected_type is str:
+        if all(type(value) is str for value in values):
+            return values
+    else:
+        try:
+            # Converted in C, unless a value is of an unexpected type.
+            return array(_TYPECODES[expected_type], values)
+        except TypeError:
+            pass
+    # Slow path: accepts whole floats in int columns, and reports the offending value otherwise.
+    converted = [convert_value(column, value) for value in values]
+    return array(_TYPECODES[expected_type], converted) if expected_type is not str else converted
+
+def to_columns(playlist: Mapping[str, Mapping[str, Any]]) -> tuple[list[str], list[Sequence[Any]]]:
+    '''
+    Converts a parsed, column-oriented playlist into typed columns, all aligned on the keys of its first column.
+    Returns the column names (`idx` first) and their values.
+
+    :raises PlaylistFormatError: If a column is missing, has a value of an invalid type, or does not have the same keys as the others.
+    '''
+    missing = [column for column in PLAYLIST_COLUMN_TYPES if column not in playlist]
+    if missing:
+        raise PlaylistFormatError(f'Missing entries: {missing}')
+    for column in PLAYLIST_COLUMN_TYPES:
+        if not isinstance(playlist[column], Mapping):
+            raise PlaylistFormatError(f'Entry {column} must be an object of index -> value.')
+    reference_column = next(iter(PLAYLIST_COLUMN_TYPES))
+    reference = playlist[reference_column]
+    keys = list(reference.keys())
+    names = ['idx']
+    columns: list[Sequence[Any]] = [array('q', [to_idx(reference_column, key) for key in keys])]
+    for column in PLAYLIST_COLUMN_TYPES:
+        entries = playlist[column]
+        if entries.keys() != reference.keys():
+            raise PlaylistFormatError(f'Entry {column} does not have the same keys as {reference_column}.')
+        # Columns are usually written in the same key order, which spares a lookup per value.
+        values = entries.values() if list(entries.keys()) == keys else (entries[key] for key in keys)
+        names.append(column)
+        columns.append(_to_column(column, values))
+    return names, columns
+
+def iter_rows(columns: list[Sequence[Any]]) -> Iterator[tuple[Any, ...]]:
+    '''
+    Iterates over typed columns row by row, without materializing the rows.
+    '''
+    return zip(*columns)
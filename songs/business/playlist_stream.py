@@ -0,0 +1,166 @@
+import json
+from typing import Any, Iterator, TextIO, Union
+from songs.entities import PlaylistFormatError, PLAYLIST_COLUMN_TYPES
+
+PlaylistValue = Union[str, int, float]
+# A playlist column, e.g. `("danceability", <iterator of (idx, value)>)`.
+PlaylistColumn = tuple[str, Iterator[tuple[int, PlaylistValue]]]
+
+_WHITESPACE = ' \t\n\r'
+# Characters that may follow a complete JSON value.
+_DELIMITERS = _WHITESPACE + ',:}]'
+
+class _JsonStream:
+    '''
+    Minimal pull tokenizer over a text stream, holding at most one chunk (plus a partial token) in memory.
+    Objects are walked structurally, while scalars are decoded by the stdlib JSON decoder.
+    '''
+    def __init__(self, f: TextIO, chunk_size: int = 1 << 16) -> None:
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        if self.eof:
+            return False
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        '''
+        Returns the next non-whitespace character without consuming it, or `''` at the end of the stream.
+        '''
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ''
+
+    def advance(self):
+        self.pos += 1
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise json.JSONDecodeError(f'Expecting {char!r}', self.buf, self.pos)
+        self.advance()
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # A number cut off by the end of the buffer, e.g. `1.` of `1.5`, continues in the next chunk.
+                if self.eof or (end < len(self.buf) and self.buf[end] in _DELIMITERS):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+def to_idx(column: str, key: Any):
+    '''
+    Parses the index of an entry of `column`, e.g. the `"12"` key of `{"title": {"12": ...}}`.
+    '''
+    try:
+        return int(key)
+    except ValueError:
+        raise PlaylistFormatError(f'Entry {column} has a non-numeric key: {key!r}')
+
+def convert_value(column: str, value: Any) -> PlaylistValue:
+    '''
+    Checks a value of `column` against its type in `PLAYLIST_COLUMN_TYPES`, e.g. turning `3.0` into `3` for integer columns.
+    '''
+    expected_type = PLAYLIST_COLUMN_TYPES[column]
+    if expected_type is str:
+        if isinstance(value, str):
+            return value
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        if expected_type is float:
+            return float(value)
+        if value == int(value):
+            return int(value)
+    raise PlaylistFormatError(f'Entry {column} has a value of an invalid type, expected {expected_type.__name__}: {value!r}')
+
+def _iter_entries(stream: _JsonStream, column: str) -> Iterator[tuple[int, PlaylistValue]]:
+    if stream.peek() != '{':
+        raise PlaylistFormatError(f'Entry {column} must be an object of index -> value.')
+    stream.advance()
+    if stream.peek() == '}':
+        stream.advance()
+        return
+    while True:
+        key = stream.value()
+        stream.expect(':')
+        yield to_idx(column, key), convert_value(column, stream.value())
+        if stream.peek() == ',':
+            stream.advance()
+            continue
+        stream.expect('}')
+        return
+
+def _skip_entries(stream: _JsonStream, column: str):
+    if stream.peek() != '{':
+        # Unknown columns are ignored, whatever their shape.
+        stream.value()
+        return
+    stream.advance()
+    if stream.peek() == '}':
+        stream.advance()
+        return
+    while True:
+        stream.value()
+        stream.expect(':')
+        stream.value()
+        if stream.peek() == ',':
+            stream.advance()
+            continue
+        stream.expect('}')
+        return
+
+def iter_playlist_columns(f: TextIO, chunk_size: int = 1 << 16) -> Iterator[PlaylistColumn]:
+    '''
+    Incrementally parses a column-oriented playlist (`{"danceability": {"0": 0.52, ...}, ...}`),
+    yielding its known columns one at a time, with their values validated and converted to the column's type.
+
+    Each column's entries must be consumed before advancing to the next column.
+    Memory use is bounded by `chunk_size`, whatever the size of the file.
+
+    :raises json.JSONDecodeError: If the file is not valid JSON.
+    :raises PlaylistFormatError: If a key or value does not follow the `PlaylistInput` format.
+    '''
+    stream = _JsonStream(f, chunk_size)
+    stream.expect('{')
+    if stream.peek() == '}':
+        stream.advance()
+    else:
+        while True:
+            column = stream.value()
+            if not isinstance(column, str):
+                raise json.JSONDecodeError('Expecting property name', stream.buf, stream.pos)
+            stream.expect(':')
+            if column in PLAYLIST_COLUMN_TYPES:
+                entries = _iter_entries(stream, column)
+                yield column, entries
+                # Drain whatever the consumer left over, to get to the next column.
+                for _ in entries:
+                    pass
+            else:
+                _skip_entries(stream, column)
+            if stream.peek() == ',':
+                stream.advance()
+                continue
+            stream.expect('}')
+            break
+    if stream.peek() != '':
+        raise json.JSONDecodeError('Extra data', stream.buf, stream.pos)
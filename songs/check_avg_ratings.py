@@ -0,0 +1,30 @@
+'''
+Consistency checker for the avg_ratings aggregates, which triggers maintain incrementally from ratings.
+
+Run from the repository root: `python -m songs.check_avg_ratings [--repair]`
+'''
+import argparse
+import asyncio
+import sys
+from dotenv import load_dotenv
+from connection_pool import connection_pool
+from songs.dal import check_avg_ratings, rebuild_avg_ratings
+
+async def main(repair: bool):
+    try:
+        inconsistent = await check_avg_ratings()
+        print(f"{inconsistent} song(s) have an average rating out of sync with their ratings.")
+        if inconsistent and repair:
+            repaired = await rebuild_avg_ratings()
+            print(f"Rebuilt the average rating of {repaired} song(s).")
+            inconsistent = 0
+        return inconsistent
+    finally:
+        await connection_pool.close()
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repair", action="store_true", help="Rebuild the aggregates that are out of sync.")
+    args = parser.parse_args()
+    sys.exit(1 if asyncio.run(main(args.repair)) else 0)
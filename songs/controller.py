@@ -1,35 +1,67 @@
 from typing import Annotated, Literal, Union
-from fastapi import APIRouter, Body, Depends, Query, Request, HTTPException, Response, status
+from fastapi import APIRouter, Body, Depends, Header, Query, Request, HTTPException, Response, status
+from common.responses import OrjsonResponse
 from auth.entities import Session
 from auth.business import verify_session
-from .validations import validate_get_songs_req
-from .business import get_songs, rate_song, get_song_by_idx_id
+from .validations import RELEVANCE_ORDER, validate_get_songs_req
+from .pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from .response_cache import songs_response_cache
+from .etag import etag_matches, song_page_etag
+from .business import get_catalog_version, get_songs, rate_song
 
 songs_api = APIRouter(prefix='/songs', tags=['Songs API'])
 
 async def get_optional_session(request: Request):
     return await verify_session(request, optional=True)
 
-@songs_api.get("/")
+@songs_api.get("/", response_class=OrjsonResponse)
 async def service_get_songs(
     session: Session = Depends(get_optional_session),
     title: Annotated[Union[str, None], Query(min_length=1, max_length=256)] = None,
     order_by: str = 'idx',
     order: Literal['asc', 'desc'] = 'asc',
     offset: int = 0,
-    limit: Annotated[int, Query(ge=1, le=100)] = 10
+    limit: Annotated[int, Query(ge=1, le=100)] = 10,
+    cursor: Annotated[Union[str, None], Query(min_length=1, max_length=1024)] = None,
+    search: Annotated[Union[str, None], Query(min_length=1, max_length=256)] = None,
+    if_none_match: Annotated[Union[str, None], Header()] = None
 ):
-    validate_get_songs_req(order_by, title)
+    validate_get_songs_req(order_by, title, search, cursor)
+    # Keyset pagination: when a cursor is given, the page starts right after it and `offset` is ignored.
+    after = decode_cursor(cursor, order_by, order) if cursor else None
     user_id = session['user_id'] if session and 'user_id' in session else ''
-    return await get_songs(title, user_id, order_by, order, offset, limit)
+    # Anonymous pages are the same for everyone: they are served from memory until the catalog or a rating changes.
+    cache_key = (title, order_by, order, 0 if after else offset, limit, after, tuple(search.lower().split()) if search else None)
+    # Read before querying the songs, so a write landing meanwhile makes the response stale rather than mislabeled.
+    version = await get_catalog_version()
+    headers = {
+        'ETag': song_page_etag(version, user_id, cache_key),
+        'Cache-Control': 'private, no-cache' if user_id else 'public, no-cache',
+        'Vary': 'Cookie'
+    }
+    # Conditional GET: the ETag only depends on the catalog version, so unchanged pages are answered without querying the songs.
+    if etag_matches(if_none_match, headers['ETag']):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    if not user_id:
+        cached = songs_response_cache.get(cache_key, version)
+        if cached:
+            if cached.next_cursor:
+                headers[NEXT_CURSOR_HEADER] = cached.next_cursor
+            return Response(cached.body, headers=headers, media_type=OrjsonResponse.media_type)
+    songs = await get_songs(title, user_id, order_by, order, offset, limit, after, search)
+    if len(songs) == limit and order_by != RELEVANCE_ORDER:
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(songs[-1], order_by, order)
+    response = OrjsonResponse(songs, headers=headers)
+    if not user_id:
+        songs_response_cache.put(cache_key, version, response.body, headers.get(NEXT_CURSOR_HEADER))
+    return response
 
 @songs_api.put("/{song_idx}/{song_id}/rating")
 async def service_rate_song(song_idx: int, song_id: str, rating: Annotated[float, Body(embed=True)], session: Session = Depends(verify_session)):
     if not session or 'user_id' not in session:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Invalid session object')
     user_id = session['user_id']
-    song = await get_song_by_idx_id(song_idx, song_id)
-    if not song:
+    # The song's existence is checked by the write itself. `None` means the rating was queued without waiting for it.
+    if await rate_song(song_idx, song_id, user_id, rating) is False:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='The specified song could not be found.')
-    await rate_song(song_idx, song_id, user_id, rating)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
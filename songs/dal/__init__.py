@@ -1,3 +1,19 @@
-from .dal import insert_songs, get_songs, get_song_ratings, rate_song, get_song_by_idx_id
+from .dal import upsert_song_rows, get_playlist_import_hash, record_playlist_import, get_songs, rate_song
+from .rating_write_queue import rating_write_queue
+from .catalog_version import get_catalog_version
+from .avg_ratings import check_avg_ratings, rebuild_avg_ratings
+from .playlist_staging import PlaylistStaging, STAGED_COLUMNS
 
-__all__ = ['insert_songs', 'get_songs', 'get_song_ratings', 'rate_song', 'get_song_by_idx_id']
\ No newline at end of file
+__all__ = [
+    'upsert_song_rows',
+    'get_playlist_import_hash',
+    'record_playlist_import',
+    'get_songs',
+    'rate_song',
+    'rating_write_queue',
+    'get_catalog_version',
+    'check_avg_ratings',
+    'rebuild_avg_ratings',
+    'PlaylistStaging',
+    'STAGED_COLUMNS'
+]
\ No newline at end of file
@@ -0,0 +1,54 @@
+from connection_pool import connection_pool
+
+# What avg_ratings should hold for every song, recomputed from scratch off the ratings table.
+_EXPECTED_AVG_RATINGS = '''
+    SELECT s.idx AS song_idx,
+    s.id AS song_id,
+    COUNT(r.rating) AS n_ratings,
+    TOTAL(r.rating) AS sum_ratings,
+    COALESCE(ROUND(TOTAL(r.rating) / COUNT(r.rating), 2), 0) AS avg_rating
+    FROM songs s
+    LEFT JOIN ratings r ON r.song_idx = s.idx AND r.song_id = s.id
+    GROUP BY s.idx, s.id
+'''
+
+# Sums are maintained incrementally, so they may drift from a fresh total by float rounding.
+_TOLERANCE = 1e-6
+
+async def check_avg_ratings() -> int:
+    '''
+    Compares avg_ratings with the ratings they aggregate, and returns the number of songs whose aggregate is off or missing.
+    '''
+    sql = f'''
+    SELECT COUNT(*)
+    FROM ({_EXPECTED_AVG_RATINGS}) e
+    LEFT JOIN avg_ratings a ON a.song_idx = e.song_idx AND a.song_id = e.song_id
+    WHERE a.song_idx IS NULL
+    OR a.n_ratings IS NOT e.n_ratings
+    OR ABS(a.sum_ratings - e.sum_ratings) > {_TOLERANCE}
+    OR a.avg_rating IS NOT e.avg_rating
+    '''
+    async with connection_pool.connection() as conn:
+        (count,) = await conn.fetchone(sql)
+        return count
+
+async def rebuild_avg_ratings() -> int:
+    '''
+    Recomputes avg_ratings from ratings, only rewriting the songs whose aggregate is off or missing.
+    Returns the number of repaired songs.
+    '''
+    sql = f'''
+    INSERT INTO avg_ratings (song_idx, song_id, n_ratings, sum_ratings, avg_rating)
+    SELECT song_idx, song_id, n_ratings, sum_ratings, avg_rating FROM ({_EXPECTED_AVG_RATINGS}) WHERE true
+    ON CONFLICT (song_idx, song_id) DO UPDATE SET
+        n_ratings = excluded.n_ratings,
+        sum_ratings = excluded.sum_ratings,
+        avg_rating = excluded.avg_rating
+    WHERE avg_ratings.n_ratings IS NOT excluded.n_ratings
+    OR ABS(avg_ratings.sum_ratings - excluded.sum_ratings) > {_TOLERANCE}
+    OR avg_ratings.avg_rating IS NOT excluded.avg_rating
+    '''
+    async with connection_pool.writer(fail_fast=False) as conn:
+        repaired = await conn.execute(sql)
+        await conn.commit()
+    return repaired
@@ -0,0 +1,15 @@
+from connection_pool import connection_pool
+from query_plans import register_query
+
+GET_CATALOG_VERSION_SQL = register_query('songs.get_catalog_version', '''
+    SELECT version FROM catalog_version WHERE id = 0
+''')
+
+async def get_catalog_version() -> int:
+    '''
+    Version of the songs and their ratings, bumped by triggers on every committed write, whichever process makes it.
+    Anything derived from the catalog (e.g. cached song pages, their ETags) is stale once the version moved past the one it was built at.
+    '''
+    async with connection_pool.connection() as conn:
+        (version,) = await conn.fetchone(GET_CATALOG_VERSION_SQL)
+        return version
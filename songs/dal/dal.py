@@ -1,241 +1,211 @@
-from typing import Literal, Union
+import re
+from functools import cache
+from itertools import starmap
+from typing import Any, Iterable, Literal, Sequence, Union
 from songs.entities import Song
+from common.profiling import span
 from connection_pool import connection_pool
+from query_plans import register_query
 from dataclasses import fields
 
-from songs.entities import Rating
+from songs.pagination import KeysetPosition
+from .rating_write_queue import rating_write_queue
 
-async def insert_songs(songs: list[Song]):
-    columns = [
-        (f.name, f.metadata.get('db', {}).get('name'))
+@cache
+def _song_columns(table: str, rating: str, user_rating: str):
+    '''
+    Select list of a song, in the order of the `Song` constructor, as expected by `_songs_from_rows`.
+    '''
+    expressions = { 'rating': rating, 'user_rating': user_rating }
+    return ',\n    '.join(
+        f'{expressions[f.name]} AS {f.name}' if f.name in expressions else f'{table}.{f.metadata["db"]["name"]}'
         for f in fields(Song)
-        if f.metadata.get('db', {}).get('insert') is True
-    ]
-    attr_names, column_names = zip(*columns)
-    col_str = ', '.join(column_names)
-    col_params = ', '.join(['?'] * len(column_names))
-    sql = f'''
-        INSERT OR IGNORE INTO songs ({col_str}) VALUES ({col_params})
+    )
+
+def _songs_from_rows(rows: Iterable[Sequence[Any]]) -> list[Song]:
+    '''
+    Row factory shared by the song queries: every row is passed as is to the `Song` constructor.
+    '''
+    return list(starmap(Song, rows))
+
+@cache
+def _upsert_sql(column_names: tuple[str, ...]):
+    updates = ', '.join(f'{column} = excluded.{column}' for column in column_names if column not in ('idx', 'id'))
+    return f'''
+        INSERT INTO songs ({', '.join(column_names)}) VALUES ({', '.join(['?'] * len(column_names))})
+        ON CONFLICT(idx, id) DO UPDATE SET {updates}
+        WHERE songs.content_hash IS NOT excluded.content_hash
+    '''
+
+async def upsert_song_rows(column_names: list[str], rows: Iterable[Sequence[Any]]) -> int:
     '''
-    values = [
-        [getattr(song, attr) for attr in attr_names] for song in songs
-    ]
+    Inserts songs given as rows of raw values for `column_names`, which must include `content_hash`.
+    Existing songs are only rewritten when their `content_hash` changed. Returns the number of songs inserted or updated.
+    '''
+    sql = _upsert_sql(tuple(column_names))
+    async with connection_pool.writer(fail_fast=False) as conn:
+        changed = await conn.executemany(sql, rows)
+        await conn.commit()
+    return changed
+
+GET_PLAYLIST_IMPORT_HASH_SQL = register_query('songs.get_playlist_import_hash', '''
+    SELECT content_hash FROM playlist_imports WHERE path = ?
+''', [''])
+
+RECORD_PLAYLIST_IMPORT_SQL = register_query('songs.record_playlist_import', '''
+    INSERT INTO playlist_imports (path, content_hash, imported_at) VALUES (?, ?, ?)
+    ON CONFLICT(path) DO UPDATE SET content_hash = excluded.content_hash, imported_at = excluded.imported_at
+''', ['', '', 0])
+
+async def get_playlist_import_hash(path: str) -> Union[str, None]:
     async with connection_pool.connection() as conn:
-        conn.executemany(sql, values)
-        conn.commit()
+        row = await conn.fetchone(GET_PLAYLIST_IMPORT_HASH_SQL, [path])
+        return row[0] if row else None
+
+async def record_playlist_import(path: str, content_hash: str, imported_at: int):
+    async with connection_pool.writer(fail_fast=False) as conn:
+        await conn.execute(RECORD_PLAYLIST_IMPORT_SQL, [path, content_hash, imported_at])
+        await conn.commit()
+
+# Column of each `Song` attribute.
+_COLUMN_NAMES = { f.name: f.metadata['db']['name'] for f in fields(Song) }
+
+@cache
+def _sort_key(order_by: str) -> tuple[str, ...]:
+    '''
+    Expressions the songs are sorted on, ending with the (idx, id) tiebreaker that keeps the order, and thus the pagination, stable.
+    '''
+    if order_by == 'rating':
+        # Served straight off `avg_ratings_avg_rating_idx`, no sorting needed.
+        return ('ar.avg_rating', 'ar.song_idx', 'ar.song_id')
+    if order_by == 'user_rating':
+        return ('COALESCE(r.rating, 0)', 's.idx', 's.id')
+    if order_by == 'idx':
+        return ('s.idx', 's.id')
+    if order_by == 'id':
+        # (id, idx) is unique on its own, and matches `songs_id_idx`.
+        return ('s.id', 's.idx')
+    if order_by == 'relevance':
+        # bm25 score of the full-text match, lower is better.
+        return ('songs_fts.rank', 's.idx', 's.id')
+    return (f's.{_COLUMN_NAMES[order_by]}', 's.idx', 's.id')
 
-async def get_songs(title: Union[str, None], order_by: str, order: Literal['asc', 'desc'], offset: int, limit: int):
-    column_mapping = { f.name: f.metadata['db']['name'] for f in fields(Song) }
-    values = []
+def _fts_query(search: str):
+    '''
+    Turns free text into an FTS5 query matching every word as a prefix, e.g. `love st` -> `"love"* "st"*`.
+    '''
+    return ' '.join(f'"{word}"*' for word in re.findall(r'\w+', search))
+
+@cache
+def _get_songs_sql(order_by: str, order: Literal['asc', 'desc'], search: bool, title: bool, after: bool):
+    '''
+    SQL of a page of songs, generated once per query shape, which also keeps the set of statements to prepare small.
+    '''
+    sort_key = _sort_key(order_by)
+    direction = order.upper()
+    conditions: list[str] = list()
     sql = f'''
-    SELECT idx,
-    id,
-    title,
-    danceability,
-    energy,
-    key,
-    loudness,
-    mode,
-    acousticness,
-    instrumentalness,
-    liveness,
-    valence,
-    tempo,
-    duration_ms,
-    time_signature,
-    num_bars,
-    num_sections,
-    num_segments,
-    class as song_class
-    FROM songs
+    SELECT {_song_columns('s', 'ar.avg_rating', 'COALESCE(r.rating, 0)')}
+    FROM songs s
+    JOIN avg_ratings ar ON ar.song_idx = s.idx AND ar.song_id = s.id
+    LEFT JOIN ratings r ON r.song_idx = s.idx AND r.song_id = s.id AND r.user_id = ?
     '''
+    if search:
+        sql += '''
+        JOIN songs_fts ON songs_fts.rowid = s.rowid
+        '''
+        conditions.append('songs_fts MATCH ?')
     if title:
+        conditions.append('s.title LIKE ?')
+    if after:
+        operator = '>' if order == 'asc' else '<'
+        conditions.append(f'({", ".join(sort_key)}) {operator} ({", ".join(["?"] * len(sort_key))})')
+    if conditions:
         sql += f'''
-        WHERE title LIKE ?
+        WHERE {' AND '.join(conditions)}
         '''
-        values.append(f'%{title}%')
     sql += f'''
-        ORDER BY {column_mapping[order_by]} {order.upper()}
+        ORDER BY {', '.join(f'{expr} {direction}' for expr in sort_key)}
         LIMIT ?
         OFFSET ?
     '''
+    return sql
+
+def _get_songs_query(
+    title: Union[str, None],
+    user_id: str,
+    order_by: str,
+    order: Literal['asc', 'desc'],
+    offset: int,
+    limit: int,
+    after: Union[KeysetPosition, None] = None,
+    search: Union[str, None] = None
+):
+    values: list[Union[str, int, float]] = [user_id]
+    if search:
+        values.append(_fts_query(search))
+    if title:
+        values.append(f'%{title}%')
+    if after:
+        (sort_value, idx, id) = after
+        position = [idx, id] if order_by == 'idx' else [id, idx] if order_by == 'id' else [sort_value, idx, id]
+        values.extend(position)
+        offset = 0
     values.extend([limit, offset])
-    async with connection_pool.connection() as conn:
-        cur = conn.cursor()
-        cur.execute(sql, values)
-        rows = cur.fetchall()
-        songs: list[Song] = list()
-        for (
-            idx, 
-            id, 
-            res_title, 
-            danceability,
-            energy,
-            key,
-            loudness,
-            mode,
-            acousticness,
-            instrumentalness,
-            liveness,
-            valence,
-            tempo,
-            duration_ms,
-            time_signature,
-            num_bars,
-            num_sections,
-            num_segments,
-            song_class,
-        ) in rows:
-            songs.append(
-                Song(
-                    idx,
-                    id,
-                    res_title,
-                    0,
-                    0,
-                    danceability,
-                    energy,
-                    key,
-                    loudness,
-                    mode,
-                    acousticness,
-                    instrumentalness,
-                    liveness,
-                    valence,
-                    tempo,
-                    duration_ms,
-                    time_signature,
-                    num_bars,
-                    num_sections,
-                    num_segments,
-                    song_class
-                )
-            )
-        return songs
-
-async def get_song_ratings(songs: list[tuple[int, str]], user_id: str = '') -> dict[str, Rating]:
-    sql = '''
-    SELECT 
-        s.id,
-        s.idx,
-        COALESCE(ar.avg_rating, 0) AS avg_rating,
-        COALESCE(r.rating, 0) AS rating
-    FROM songs s
-    LEFT JOIN ratings r ON s.id = r.song_id AND s.idx = r.song_idx AND r.user_id = ?
-    LEFT JOIN avg_ratings ar ON s.id = ar.song_id AND s.idx = ar.song_idx
+    return _get_songs_sql(order_by, order, bool(search), bool(title), bool(after)), values
+
+async def get_songs(
+    title: Union[str, None],
+    user_id: str,
+    order_by: str,
+    order: Literal['asc', 'desc'],
+    offset: int,
+    limit: int,
+    after: Union[KeysetPosition, None] = None,
+    search: Union[str, None] = None
+):
     '''
-    values: list[Union[str, int, float]] = [user_id]
-    idx_list = []
-    id_list = []
-    if songs:
-        params = ''
-        for (idx, id) in songs:
-            params += '?,'
-            idx_list.append(idx)
-            id_list.append(id)
-        params = params[0:-1]
-        values.extend(idx_list)
-        values.extend(id_list)
-        sql += f'''
-        WHERE s.idx IN ({params}) AND s.id IN ({params})
-        '''
-    async with connection_pool.connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute(sql, values)
-        rows = cursor.fetchall()
-        mapping: dict[str, Rating] = dict()
-        if rows:
-            for (id, idx, avg_rating, user_rating) in rows:
-                mapping[f'{id}_{idx}'] = {
-                    'avg_rating': avg_rating,
-                    'user_rating': user_rating
-                }
-        return mapping
-
-async def get_song_by_idx_id(song_idx: int, song_id: str):
-    sql = '''
-    SELECT idx,
-    id,
-    title,
-    danceability,
-    energy,
-    key,
-    loudness,
-    mode,
-    acousticness,
-    instrumentalness,
-    liveness,
-    valence,
-    tempo,
-    duration_ms,
-    time_signature,
-    num_bars,
-    num_sections,
-    num_segments,
-    class as song_class
-    FROM songs
-    WHERE idx = ? AND id = ?
-    '''
-    values = [song_idx, song_id]
-    async with connection_pool.connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute(sql, values)
-        rows = cursor.fetchall()
-        if rows:
-            (
-                idx, 
-                id, 
-                res_title, 
-                danceability,
-                energy,
-                key,
-                loudness,
-                mode,
-                acousticness,
-                instrumentalness,
-                liveness,
-                valence,
-                tempo,
-                duration_ms,
-                time_signature,
-                num_bars,
-                num_sections,
-                num_segments,
-                song_class
-            ) = rows[0]
-            return Song(
-                idx,
-                id,
-                res_title,
-                0,
-                0,
-                danceability,
-                energy,
-                key,
-                loudness,
-                mode,
-                acousticness,
-                instrumentalness,
-                liveness,
-                valence,
-                tempo,
-                duration_ms,
-                time_signature,
-                num_bars,
-                num_sections,
-                num_segments,
-                song_class
-            )
-        return None
+    Fetches a page of songs along with their average rating and the rating given by `user_id`, in a single query.
+
+    If `after` is given, the page starts right after that keyset position and `offset` is ignored,
+    so deep pages cost the same as the first one.
+    If `search` is given, songs are filtered through the `songs_fts` full-text index.
+    '''
+    (sql, values) = _get_songs_query(title, user_id, order_by, order, offset, limit, after, search)
+    with span('dal.query'):
+        async with connection_pool.connection() as conn:
+            rows = await conn.fetchall(sql, values)
+    with span('dal.row_mapping'):
+        return _songs_from_rows(rows)
 
 async def rate_song(song_idx: int, song_id: str, user_id: str, rating: float):
-    sql = '''
-    INSERT INTO ratings (song_idx, song_id, user_id, rating)
-    VALUES (?, ?, ?, ?)
-    ON CONFLICT(song_idx, song_id, user_id)
-    DO UPDATE SET rating = excluded.rating;
     '''
-    values = [song_idx, song_id, user_id, rating]
-    async with connection_pool.connection() as conn:
-        conn.execute(sql, values)
-        conn.commit()
\ No newline at end of file
+    Rates a song, if it exists. Returns whether it does, or `None` if the rating is written in the background.
+    '''
+    # Ratings are group-committed, see `RatingWriteQueue`.
+    return await rating_write_queue.submit(song_idx, song_id, user_id, rating)
+
+def _register_song_queries():
+    '''
+    Registers the variants of the dynamically built song queries for `check_query_plans`.
+    '''
+    # The first page of a listing walks the index of its sort key, and stops after `limit` rows.
+    # Following pages must seek straight to the keyset position instead.
+    first_page_walks = ('SCAN s USING INDEX', 'SCAN ar USING COVERING INDEX')
+    for order_by in [f.name for f in fields(Song)]:
+        for after in (None, (0, 0, '')):
+            allow = first_page_walks if after is None else ()
+            if order_by == 'user_rating':
+                # Known cost: the user's ratings are sparse, so every song is sorted on them.
+                allow = ('SCAN ar USING COVERING INDEX', 'USE TEMP B-TREE FOR ORDER BY')
+            (sql, values) = _get_songs_query(None, 'user', order_by, 'desc', 0, 10, after)
+            register_query(f'songs.get_songs[{order_by}{", after" if after else ""}]', sql, values, allow)
+    # `LIKE '%...%'` can't seek, so a title filter walks the index of the sort key until the page is full.
+    (sql, values) = _get_songs_query('cold', 'user', 'idx', 'asc', 0, 10)
+    register_query('songs.get_songs[idx, title]', sql, values, first_page_walks)
+    for order_by in ('relevance', 'idx'):
+        # Only the full-text matches are sorted.
+        (sql, values) = _get_songs_query(None, 'user', order_by, 'asc', 0, 10, None, 'cold feet')
+        register_query(f'songs.get_songs[{order_by}, search]', sql, values, ['USE TEMP B-TREE FOR ORDER BY'])
+
+_register_song_queries()
@@ -0,0 +1,105 @@
+from concurrent.futures import CancelledError
+import os
+from sqlite3 import Connection, IntegrityError
+import tempfile
+from threading import Event
+from typing import Any, AsyncIterator, Iterable, Iterator
+from connection_pool import AsyncConnection
+from songs.entities import PlaylistFormatError, PLAYLIST_COLUMN_TYPES
+
+# Staging columns, in the order of `INSERT_COLUMNS` in the songs DAL.
+STAGED_COLUMNS = ['idx', *PLAYLIST_COLUMN_TYPES.keys()]
+
+def _flush_column(conn: Connection, column: str, first: bool, batch: list[tuple[Any, int]]):
+    if first:
+        try:
+            conn.executemany(f'INSERT INTO staging ("{column}", idx) VALUES (?, ?)', batch)
+        except IntegrityError:
+            raise PlaylistFormatError(f'Entry {column} has duplicate keys.')
+        return
+    updated = conn.executemany(f'UPDATE staging SET "{column}" = ? WHERE idx = ?', batch).rowcount
+    if updated != len(batch):
+        raise PlaylistFormatError(f'Entry {column} has keys that are missing from the other entries.')
+
+def _stage(conn: Connection, columns: Iterable[tuple[str, Iterator[tuple[int, Any]]]], batch_size: int, cancelled: Event):
+    '''
+    Writes the columns into the staging table, `batch_size` values at a time.
+    The first column inserts the rows, the following ones fill their column in.
+    '''
+    counts: dict[str, int] = dict()
+    for column, entries in columns:
+        if column in counts:
+            raise PlaylistFormatError(f'Entry {column} is present more than once.')
+        first = not counts
+        count = 0
+        batch: list[tuple[Any, int]] = list()
+        for idx, value in entries:
+            batch.append((value, idx))
+            if len(batch) >= batch_size:
+                # The import was cancelled (e.g. on shutdown) while this thread was busy staging.
+                if cancelled.is_set():
+                    raise CancelledError()
+                _flush_column(conn, column, first, batch)
+                count += len(batch)
+                batch = list()
+        if batch:
+            _flush_column(conn, column, first, batch)
+            count += len(batch)
+        counts[column] = count
+    missing = [column for column in PLAYLIST_COLUMN_TYPES if column not in counts]
+    if missing:
+        raise PlaylistFormatError(f'Missing entries: {missing}')
+    reference_column, reference_len = next(iter(counts.items()))
+    for column, count in counts.items():
+        if count != reference_len:
+            raise PlaylistFormatError(f'Entry {column} has unequal number of entries: {count} vs {reference_len} in {reference_column}')
+    conn.commit()
+    return reference_len
+
+def _fetch_page(conn: Connection, after_idx: int, batch_size: int):
+    cols = ', '.join(f'"{column}"' for column in STAGED_COLUMNS)
+    return conn.execute(
+        f'SELECT {cols} FROM staging WHERE idx > ? ORDER BY idx LIMIT ?', [after_idx, batch_size]
+    ).fetchall()
+
+class PlaylistStaging:
+    '''
+    Scratch SQLite database used to pivot a column-oriented playlist into rows without holding it in memory.
+    It lives in a temporary file, separate from the main DB, so staging never contends with the writer connection.
+    '''
+    def __init__(self) -> None:
+        fd, self.path = tempfile.mkstemp(prefix='playlist_staging_', suffix='.db')
+        os.close(fd)
+        self.conn = AsyncConnection(self.path, ['PRAGMA journal_mode = OFF', 'PRAGMA synchronous = OFF'])
+        self._cancelled = Event()
+
+    async def __aenter__(self):
+        cols = ', '.join(f'"{column}"' for column in STAGED_COLUMNS[1:])
+        await self.conn.execute(f'CREATE TABLE staging (idx INTEGER PRIMARY KEY, {cols})')
+        return self
+
+    async def __aexit__(self, *_):
+        self._cancelled.set()
+        await self.conn.close()
+        os.remove(self.path)
+
+    async def stage(self, columns: Iterable[tuple[str, Iterator[tuple[int, Any]]]], batch_size: int) -> int:
+        '''
+        Consumes `columns` on the staging connection's worker thread, so lazy parsing happens off the event loop too.
+        Returns the number of staged songs.
+
+        :raises PlaylistFormatError: If columns are missing, or do not all have the same keys.
+        '''
+        return await self.conn.run(_stage, columns, batch_size, self._cancelled)
+
+    async def rows(self, batch_size: int) -> AsyncIterator[list[tuple[Any, ...]]]:
+        '''
+        Yields the staged songs in pages of `batch_size` rows, ordered by idx.
+        '''
+        after_idx = -(1 << 63)
+        while True:
+            page = await self.conn.run(_fetch_page, after_idx, batch_size)
+            if not page:
+                return
+            yield page
+            after_idx = page[-1][0]
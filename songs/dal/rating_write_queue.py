@@ -0,0 +1,146 @@
+from asyncio import Future, Task, TimerHandle, gather, get_running_loop
+from dataclasses import dataclass
+import logging
+import os
+from sqlite3 import Connection
+from typing import Literal, Union
+from common.config import LazyConfig
+from connection_pool import ConnectionPool, connection_pool
+from query_plans import register_query
+
+RatingKey = tuple[int, str, str]
+
+# Inserts nothing for an unknown song, so its existence is checked by the write itself.
+UPSERT_RATING_SQL = register_query('songs.upsert_rating', '''
+    INSERT INTO ratings (song_idx, song_id, user_id, rating)
+    SELECT ?1, ?2, ?3, ?4
+    WHERE EXISTS (SELECT 1 FROM songs WHERE idx = ?1 AND id = ?2)
+    ON CONFLICT(song_idx, song_id, user_id)
+    DO UPDATE SET rating = excluded.rating
+    WHERE ratings.rating IS NOT excluded.rating;
+''', [0, '', '', 0])
+
+SONG_EXISTS_SQL = register_query('songs.song_exists', '''
+    SELECT 1 FROM songs WHERE idx = ? AND id = ?
+''', [0, ''])
+
+@dataclass
+class RatingWriteConfig:
+    '''
+    Group-commit settings for rating writes, overridable through the `RATING_*` environment variables.
+    '''
+    # A batch is flushed at the latest `flush_interval_ms` after its first rating was queued...
+    flush_interval_ms: float = 10
+    # ...or as soon as it holds `max_batch_size` distinct ratings.
+    max_batch_size: int = 500
+    # `commit`: callers wait until their batch is committed. `fire_and_forget`: callers return as soon as it is queued.
+    mode: Literal['commit', 'fire_and_forget'] = 'commit'
+
+    @staticmethod
+    def from_env():
+        defaults = RatingWriteConfig()
+        mode = os.getenv('RATING_WRITE_MODE', defaults.mode)
+        return RatingWriteConfig(
+            flush_interval_ms=float(os.getenv('RATING_FLUSH_INTERVAL_MS', defaults.flush_interval_ms)),
+            max_batch_size=int(os.getenv('RATING_MAX_BATCH_SIZE', defaults.max_batch_size)),
+            mode='fire_and_forget' if mode == 'fire_and_forget' else 'commit'
+        )
+
+def _write_batch(conn: Connection, rows: list[tuple[int, str, str, float]]) -> list[bool]:
+    '''
+    Writes the ratings in a single transaction, and thus a single fsync, for the whole batch.
+    Returns whether the song of each rating exists.
+    '''
+    try:
+        found: list[bool] = list()
+        for (song_idx, song_id, user_id, rating) in rows:
+            written = conn.execute(UPSERT_RATING_SQL, (song_idx, song_id, user_id, rating)).rowcount
+            # Nothing written: either the song does not exist, or the user re-submitted the same rating.
+            found.append(written > 0 or conn.execute(SONG_EXISTS_SQL, (song_idx, song_id)).fetchone() is not None)
+        conn.commit()
+        return found
+    except Exception:
+        conn.rollback()
+        raise
+
+class RatingWriteQueue:
+    '''
+    Write-behind queue that coalesces ratings and commits them in batches.
+
+    Ratings for the same `(song_idx, song_id, user_id)` within a batch are coalesced, the last write wins.
+    '''
+    config = LazyConfig(RatingWriteConfig.from_env)
+
+    def __init__(self, pool: ConnectionPool = connection_pool, config: Union[RatingWriteConfig, None] = None) -> None:
+        self.pool = pool
+        self.config = config
+        self.flushed_batches = 0
+        self.flushed_rows = 0
+        self._pending: dict[RatingKey, float] = dict()
+        self._waiters: list[tuple[RatingKey, Future[bool]]] = list()
+        self._timer: Union[TimerHandle, None] = None
+        self._flushes: set[Task[None]] = set()
+
+    async def submit(self, song_idx: int, song_id: str, user_id: str, rating: float) -> Union[bool, None]:
+        '''
+        Queues a rating. In `commit` mode, returns only once the batch containing it has been committed,
+        with whether the song exists (the ratings of unknown songs are not written).
+        In `fire_and_forget` mode, returns `None` as soon as it is queued.
+        '''
+        config = self.config
+        loop = get_running_loop()
+        key = (song_idx, song_id, user_id)
+        self._pending[key] = rating
+        waiter: Union[Future[bool], None] = None
+        if config.mode == 'commit':
+            waiter = loop.create_future()
+            self._waiters.append((key, waiter))
+        if len(self._pending) >= config.max_batch_size:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(config.flush_interval_ms / 1000, self._start_flush)
+        if waiter is not None:
+            return await waiter
+        return None
+
+    def _start_flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        rows = [(*key, rating) for key, rating in self._pending.items()]
+        waiters = self._waiters
+        self._pending = dict()
+        self._waiters = list()
+        task = get_running_loop().create_task(self._flush(rows, waiters))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, rows: list[tuple[int, str, str, float]], waiters: list[tuple[RatingKey, Future[bool]]]):
+        # Flushes queue up on the writer connection in FIFO order, so later batches always win over earlier ones.
+        try:
+            async with self.pool.writer(fail_fast=False) as conn:
+                found = await conn.run(_write_batch, rows)
+        except Exception as ex:
+            if not waiters:
+                logging.exception(f'Failed to write a batch of {len(rows)} ratings.')
+            for (_, waiter) in waiters:
+                if not waiter.done():
+                    waiter.set_exception(ex)
+            return
+        self.flushed_batches += 1
+        self.flushed_rows += len(rows)
+        found_by_key = { row[:3]: exists for (row, exists) in zip(rows, found) }
+        for (key, waiter) in waiters:
+            if not waiter.done():
+                waiter.set_result(found_by_key[key])
+
+    async def close(self):
+        '''
+        Flushes pending ratings and waits for in-flight batches to be committed.
+        '''
+        self._start_flush()
+        await gather(*self._flushes)
+
+rating_write_queue = RatingWriteQueue()
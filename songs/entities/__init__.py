@@ -1,5 +1,6 @@
 from .song import Song
-from .playlist_input import PlaylistInput
+from .playlist_input import PlaylistInput, PlaylistFormatError, PLAYLIST_COLUMN_TYPES
 from .rating import Rating
+from .playlist_import import PlaylistImport
 
-__all__ = ['Song', 'PlaylistInput', 'Rating']
\ No newline at end of file
+__all__ = ['Song', 'PlaylistInput', 'PlaylistFormatError', 'PLAYLIST_COLUMN_TYPES', 'Rating', 'PlaylistImport']
\ No newline at end of file
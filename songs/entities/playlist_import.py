@@ -0,0 +1,19 @@
+from dataclasses import dataclass
+from typing import Literal
+
+@dataclass
+class PlaylistImport:
+    '''
+    Outcome of a playlist import.
+    '''
+    # Songs read from the file, and how many of them were new or had changed.
+    songs: int
+    changed: int
+    seconds: float
+    # `in_memory`: the file was parsed at once and converted column by column. `streaming`: it was staged in bounded memory.
+    # `unchanged`: the file was already imported as is, and was skipped.
+    mode: Literal['in_memory', 'streaming', 'unchanged']
+
+    @property
+    def rows_per_second(self):
+        return self.songs / self.seconds if self.seconds > 0 else float('inf')
@@ -1,3 +1,4 @@
+from typing import get_args
 from pydantic import BaseModel, Field
 
 class PlaylistInput(BaseModel):
@@ -22,4 +23,14 @@ class PlaylistInput(BaseModel):
     num_bars: dict[str, int]
     num_sections: dict[str, int]
     num_segments: dict[str, int]
-    class_: dict[str, int] = Field(alias='class')
\ No newline at end of file
+    class_: dict[str, int] = Field(alias='class')
+
+# Value type of every column of the playlist, keyed by its name in the JSON file.
+PLAYLIST_COLUMN_TYPES: dict[str, type] = {
+    (f.alias or name): get_args(f.annotation)[1] for name, f in PlaylistInput.model_fields.items()
+}
+
+class PlaylistFormatError(ValueError):
+    '''
+    Raised when a playlist file is valid JSON, but does not follow the format of `PlaylistInput`.
+    '''
@@ -1,6 +1,7 @@
 from dataclasses import dataclass, field
 
-@dataclass
+# Slotted: no per-instance `__dict__`, which makes songs smaller and quicker to build, e.g. when materializing a page of them.
+@dataclass(slots=True)
 class Song:
     idx: int = field(metadata={ 'db': { 'insert': True, 'name': 'idx' }})
     id: str = field(metadata={ 'db': { 'insert': True, 'name': 'id' }})
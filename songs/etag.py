@@ -0,0 +1,21 @@
+import hashlib
+from typing import Hashable, Union
+
+def song_page_etag(version: int, user_id: str, params: Hashable) -> str:
+    '''
+    Strong ETag of a songs page, derived from the catalog version, the user whose ratings it shows and its query params.
+    The version is persisted and bumped by every committed write to songs or ratings, so the ETag is computed without querying the songs,
+    and is the same on every worker.
+    '''
+    digest = hashlib.blake2b(f'{version}:{user_id}:{params!r}'.encode(), digest_size=16).hexdigest()
+    return f'"{digest}"'
+
+def etag_matches(if_none_match: Union[str, None], etag: str) -> bool:
+    '''
+    Evaluates an `If-None-Match` header against `etag`, using the weak comparison required for it by RFC 9110.
+    '''
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    return any(tag.strip().removeprefix('W/') == etag for tag in if_none_match.split(','))
@@ -0,0 +1,50 @@
+import base64
+import binascii
+import json
+from typing import Literal, Union
+from fastapi.exceptions import RequestValidationError
+from .entities import Song
+
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+# Last sort key seen, followed by the (idx, id) tiebreaker.
+KeysetPosition = tuple[Union[int, float, str], int, str]
+
+def encode_cursor(last_song: Song, order_by: str, order: Literal['asc', 'desc']) -> str:
+    '''
+    Encodes the position right after `last_song` into an opaque cursor for the given sort order.
+    '''
+    payload = [order_by, order, getattr(last_song, order_by), last_song.idx, last_song.id]
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str, order_by: str, order: Literal['asc', 'desc']) -> KeysetPosition:
+    '''
+    Decodes a cursor produced by `encode_cursor`.
+
+    :raises RequestValidationError: If the cursor is malformed, or was issued for a different sort order.
+    '''
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_order_by, cursor_order, sort_value, idx, id = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise RequestValidationError([{
+            'loc': ['query', 'cursor'],
+            'msg': 'Malformed cursor.'
+        }])
+    valid_types = (
+        isinstance(sort_value, (int, float, str))
+        and isinstance(idx, int)
+        and isinstance(id, str)
+    )
+    if not valid_types:
+        raise RequestValidationError([{
+            'loc': ['query', 'cursor'],
+            'msg': 'Malformed cursor.'
+        }])
+    if cursor_order_by != order_by or cursor_order != order:
+        raise RequestValidationError([{
+            'loc': ['query', 'cursor'],
+            'msg': f'The cursor was issued for `order_by={cursor_order_by}&order={cursor_order}` and cannot be used with a different order.'
+        }])
+    return (sort_value, idx, id)
@@ -0,0 +1,78 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+import os
+import time
+from typing import Hashable, Union
+from common.config import LazyConfig
+
+@dataclass
+class SongsCacheConfig:
+    '''
+    Size and TTL of the anonymous songs response cache, overridable through the `SONGS_CACHE_*` environment variables.
+    '''
+    max_size: int = 1024
+    # Upper bound on how long a response is served, whatever the catalog version.
+    ttl_seconds: float = 5
+
+    @staticmethod
+    def from_env():
+        defaults = SongsCacheConfig()
+        return SongsCacheConfig(
+            max_size=int(os.getenv('SONGS_CACHE_SIZE', defaults.max_size)),
+            ttl_seconds=float(os.getenv('SONGS_CACHE_TTL_SECONDS', defaults.ttl_seconds))
+        )
+
+@dataclass
+class CachedResponse:
+    body: bytes
+    next_cursor: Union[str, None]
+    version: int
+    cached_until: float
+
+class SongsResponseCache:
+    '''
+    In-process LRU cache of serialized `GET /songs` responses for anonymous requests, keyed by their normalized query params.
+    An entry is only served while the catalog version it was built at is current, and for at most `ttl_seconds`.
+    Responses only hold what varies with the catalog: headers derived from the request, like the ETag, are rebuilt on every hit.
+    '''
+    config = LazyConfig(SongsCacheConfig.from_env)
+
+    def __init__(self, config: Union[SongsCacheConfig, None] = None) -> None:
+        self.config = config
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, CachedResponse] = OrderedDict()
+
+    def get(self, key: Hashable, version: int) -> Union[CachedResponse, None]:
+        '''
+        Cached response for `key`, if it was built from the catalog at `version`.
+        '''
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry.version == version and time.time() < entry.cached_until:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key: Hashable, version: int, body: bytes, next_cursor: Union[str, None]):
+        '''
+        Caches a response built from the catalog at `version`, to be read before querying its songs:
+        if a write landed meanwhile, the entry is never served.
+        '''
+        config = self.config
+        if config.max_size <= 0:
+            return
+        self._entries[key] = CachedResponse(body, next_cursor, version, time.time() + config.ttl_seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > config.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+songs_response_cache = SongsResponseCache()
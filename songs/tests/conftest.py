@@ -0,0 +1,36 @@
+import os
+import sqlite3
+from unittest.mock import patch
+import pytest
+from connection_pool import ConnectionPool, PoolConfig
+from migrations import migrate_connection
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "db", "migrations")
+
+@pytest.fixture
+def db_path(tmp_path):
+    '''
+    Fully migrated database, holding songs (0, "a") and (1, "b"), and users "u1" and "u2".
+    '''
+    path = str(tmp_path / "test.db")
+    conn = sqlite3.connect(path)
+    migrate_connection(conn, MIGRATIONS_DIR)
+    conn.executemany("INSERT INTO songs (idx, id, title) VALUES (?, ?, ?)", [(0, "a", "A"), (1, "b", "B")])
+    conn.executemany("INSERT INTO users (id, username) VALUES (?, ?)", [("u1", "u1"), ("u2", "u2")])
+    conn.commit()
+    conn.close()
+    return path
+
+@pytest.fixture
+async def pool(db_path: str):
+    '''
+    Pool over `db_path`, used by the songs DAL in place of the server's.
+    '''
+    pool = ConnectionPool(PoolConfig(max_connections=1), db_path=db_path)
+    with (
+        patch("songs.dal.dal.connection_pool", pool),
+        patch("songs.dal.avg_ratings.connection_pool", pool),
+        patch("songs.dal.catalog_version.connection_pool", pool)
+    ):
+        yield pool
+    await pool.close()
@@ -0,0 +1,55 @@
+import sqlite3
+from connection_pool import ConnectionPool
+from songs.dal import check_avg_ratings, rebuild_avg_ratings
+from songs.dal.rating_write_queue import UPSERT_RATING_SQL
+
+def rate(conn: sqlite3.Connection, user_id: str, rating: float):
+    '''
+    Rates song (0, "a"), and returns the number of rows written, triggers included.
+    '''
+    before = conn.total_changes
+    conn.execute(UPSERT_RATING_SQL, (0, "a", user_id, rating))
+    return conn.total_changes - before
+
+def test_rating_changes_update_the_aggregate_once(db_path: str):
+    conn = sqlite3.connect(db_path)
+    assert rate(conn, "u1", 4) == 3
+    assert rate(conn, "u2", 1) == 3
+    # The rating row, then a single delta on the aggregate, which bumps the catalog version.
+    assert rate(conn, "u1", 2) == 3
+    # Re-submitting the same rating writes nothing.
+    assert rate(conn, "u1", 2) == 0
+    assert conn.execute("SELECT n_ratings, sum_ratings, avg_rating FROM avg_ratings WHERE song_idx = 0").fetchone() == (2, 3, 1.5)
+    conn.execute("DELETE FROM ratings WHERE user_id = 'u2'")
+    assert conn.execute("SELECT n_ratings, sum_ratings, avg_rating FROM avg_ratings WHERE song_idx = 0").fetchone() == (1, 2, 2)
+    conn.execute("DELETE FROM ratings WHERE user_id = 'u1'")
+    assert conn.execute("SELECT n_ratings, sum_ratings, avg_rating FROM avg_ratings WHERE song_idx = 0").fetchone() == (0, 0, 0)
+
+def test_writes_bump_the_catalog_version(db_path: str):
+    conn = sqlite3.connect(db_path)
+    def version():
+        return conn.execute("SELECT version FROM catalog_version").fetchone()[0]
+    before = version()
+    rate(conn, "u1", 4)
+    after_rating = version()
+    assert after_rating > before
+    rate(conn, "u1", 4)
+    assert version() == after_rating
+    conn.execute("UPDATE songs SET title = 'A2' WHERE idx = 0")
+    assert version() > after_rating
+
+async def test_check_and_rebuild_avg_ratings(db_path: str, pool: ConnectionPool):
+    conn = sqlite3.connect(db_path)
+    rate(conn, "u1", 4)
+    rate(conn, "u2", 3)
+    conn.commit()
+    assert await check_avg_ratings() == 0
+    conn.execute("UPDATE avg_ratings SET avg_rating = 5 WHERE song_idx = 0")
+    conn.execute("DELETE FROM avg_ratings WHERE song_idx = 1")
+    conn.commit()
+    assert await check_avg_ratings() == 2
+    assert await rebuild_avg_ratings() == 2
+    assert await check_avg_ratings() == 0
+    assert conn.execute("SELECT song_idx, n_ratings, sum_ratings, avg_rating FROM avg_ratings ORDER BY song_idx").fetchall() == [
+        (0, 2, 7, 3.5), (1, 0, 0, 0)
+    ]
@@ -1,56 +1,39 @@
+from dataclasses import fields
+import json
 from unittest.mock import AsyncMock, patch
 
-from songs.business import load_playlist
+from songs.business import import_playlist
 from songs.business import get_songs
+from songs.entities import Song
 from songs.tests.test_entities import transformed_songs, playlist_data, songs_with_ratings_no_user, songs_with_ratings_user
 
-@patch("songs.business.business.insert_songs", new_callable=AsyncMock)
-async def test_load_playlist(mock_insert_songs: AsyncMock):
-    await load_playlist(playlist_data) # type: ignore
-    mock_insert_songs.assert_awaited_once_with(transformed_songs)
+@patch("songs.business.business.record_playlist_import", new_callable=AsyncMock)
+@patch("songs.business.business.get_playlist_import_hash", new_callable=AsyncMock, return_value=None)
+@patch("songs.business.business.upsert_song_rows", new_callable=AsyncMock)
+async def test_import_playlist(mock_upsert_song_rows: AsyncMock, mock_get_hash: AsyncMock, mock_record: AsyncMock, tmp_path):
+    path = tmp_path / "playlist.json"
+    path.write_text(json.dumps(playlist_data))
+    mock_upsert_song_rows.return_value = 1
+    result = await import_playlist(str(path))
+    assert (result.songs, result.changed) == (len(transformed_songs), 1)
+    mock_upsert_song_rows.assert_awaited_once()
+    (columns, rows) = mock_upsert_song_rows.await_args.args
+    # Rows follow the column order, idx first, and end with the hash of the song.
+    song_rows = [[getattr(song, f.name) for f in fields(Song) if f.metadata['db']['insert']] for song in transformed_songs]
+    assert columns == [f.metadata['db']['name'] for f in fields(Song) if f.metadata['db']['insert']] + ['content_hash']
+    assert [list(row[:-1]) for row in rows] == song_rows
 
 @patch("songs.business.business.get_songs_dl", new_callable=AsyncMock)
-@patch("songs.business.business.get_song_ratings", new_callable=AsyncMock)
-async def test_get_songs_no_user_success(mock_get_song_ratings: AsyncMock, mock_get_songs: AsyncMock):
-    mock_get_songs.return_value = transformed_songs
-    mock_get_song_ratings.return_value = {
-        '5vYA1mW9g2Coh1HUFUSmlb_0': {
-            'user_rating': 0,
-            'avg_rating': 3
-        },
-        '2klCjJcucgGQysgH170npL_1': {
-            'user_rating': 0,
-            'avg_rating': 3.5
-        },
-        '093PI3mdUvOSlvMYDwnV1e_2': {
-            'user_rating': 0,
-            'avg_rating': 4
-        },
-    }
+async def test_get_songs_no_user_success(mock_get_songs: AsyncMock):
+    mock_get_songs.return_value = songs_with_ratings_no_user
     result = await get_songs(None)
     assert result == songs_with_ratings_no_user
-    mock_get_songs.assert_awaited_once()
-    mock_get_song_ratings.assert_awaited_once()
+    mock_get_songs.assert_awaited_once_with(None, "", "idx", "asc", 0, 10, None, None)
 
 @patch("songs.business.business.get_songs_dl", new_callable=AsyncMock)
-@patch("songs.business.business.get_song_ratings", new_callable=AsyncMock)
-async def test_get_songs_with_user_success(mock_get_song_ratings: AsyncMock, mock_get_songs: AsyncMock):
-    mock_get_songs.return_value = transformed_songs
-    mock_get_song_ratings.return_value = {
-        '5vYA1mW9g2Coh1HUFUSmlb_0': {
-            'user_rating': 1,
-            'avg_rating': 3
-        },
-        '2klCjJcucgGQysgH170npL_1': {
-            'user_rating': 2,
-            'avg_rating': 3.5
-        },
-        '093PI3mdUvOSlvMYDwnV1e_2': {
-            'user_rating': 3,
-            'avg_rating': 4
-        },
-    }
-    result = await get_songs(None)
+async def test_get_songs_with_user_ordered_by_rating_success(mock_get_songs: AsyncMock):
+    mock_get_songs.return_value = songs_with_ratings_user
+    result = await get_songs("a", "1", "user_rating", "desc", 20, 10)
     assert result == songs_with_ratings_user
-    mock_get_songs.assert_awaited_once()
-    mock_get_song_ratings.assert_awaited_once()
+    # Joins and rating order are resolved by the DAL in a single query.
+    mock_get_songs.assert_awaited_once_with("a", "1", "user_rating", "desc", 20, 10, None, None)
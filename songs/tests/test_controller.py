@@ -8,9 +8,20 @@ from unittest.mock import AsyncMock, Mock, patch
 from auth.entities.session import Session
 from songs.controller import songs_api
 from songs.entities.song import Song
+from songs.response_cache import songs_response_cache
 
 valid_session = {"user_id": "123", "id": "abc", "expires_at": datetime.now(timezone.utc) + timedelta(days=7)}
 
+@pytest.fixture(autouse=True)
+def clear_songs_response_cache():
+    songs_response_cache.clear()
+
+@pytest.fixture(autouse=True)
+def catalog_version():
+    with patch("songs.controller.get_catalog_version", new_callable=AsyncMock) as mock_get_catalog_version:
+        mock_get_catalog_version.return_value = 7
+        yield mock_get_catalog_version
+
 @pytest.fixture
 def session():
     return valid_session
@@ -59,9 +70,106 @@ async def test_get_songs_success(mock_verify_session: AsyncMock, mock_validate:
 
     assert response.status_code == status.HTTP_200_OK
     mock_verify_session.assert_awaited_once()
-    mock_validate.assert_called_once_with("idx", "love")
-    mock_get_songs.assert_awaited_once_with("love", "123", "idx", "desc", 0, 5)
+    mock_validate.assert_called_once_with("idx", "love", None, None)
+    mock_get_songs.assert_awaited_once_with("love", "123", "idx", "desc", 0, 5, None, None)
     assert response.json() == [{"title": "test"}]
+    assert "x-next-cursor" not in response.headers
+
+@patch("songs.controller.get_songs", new_callable=AsyncMock)
+@patch("songs.controller.verify_session", new_callable=AsyncMock)
+async def test_get_songs_cursor_pagination(mock_verify_session: AsyncMock, mock_get_songs: AsyncMock, async_client: AsyncClient):
+    mock_verify_session.return_value = None
+    mock_get_songs.return_value = [
+        Song(1, "a", "test", 4.5, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0),
+        Song(7, "b", "test", 3.5, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0),
+    ]
+    response = await async_client.get("/songs/?order_by=rating&order=desc&limit=2")
+    assert response.status_code == status.HTTP_200_OK
+    next_cursor = response.headers["x-next-cursor"]
+
+    mock_get_songs.reset_mock()
+    mock_get_songs.return_value = []
+    response = await async_client.get(f"/songs/?order_by=rating&order=desc&limit=2&offset=40&cursor={next_cursor}")
+    assert response.status_code == status.HTTP_200_OK
+    mock_get_songs.assert_awaited_once_with(None, "", "rating", "desc", 40, 2, (3.5, 7, "b"), None)
+    assert "x-next-cursor" not in response.headers
+
+@patch("songs.controller.get_songs", new_callable=AsyncMock)
+@patch("songs.controller.verify_session", new_callable=AsyncMock)
+async def test_get_songs_anonymous_cached(mock_verify_session: AsyncMock, mock_get_songs: AsyncMock, async_client: AsyncClient, catalog_version: AsyncMock):
+    mock_verify_session.return_value = None
+    mock_get_songs.return_value = [Song(1, "a", "test", 4.5, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0)]
+    first = await async_client.get("/songs/?order_by=rating&limit=1")
+    # Same normalized params: served from the cache.
+    second = await async_client.get("/songs/?limit=1&order=asc&order_by=rating")
+    mock_get_songs.assert_awaited_once()
+    assert second.status_code == status.HTTP_200_OK
+    assert second.content == first.content
+    assert second.headers["x-next-cursor"] == first.headers["x-next-cursor"]
+    assert second.headers["content-type"] == "application/json"
+    # A write to the catalog or to the ratings invalidates it.
+    catalog_version.return_value += 1
+    await async_client.get("/songs/?order_by=rating&limit=1")
+    assert mock_get_songs.await_count == 2
+
+@patch("songs.controller.get_songs", new_callable=AsyncMock)
+@patch("songs.controller.verify_session", new_callable=AsyncMock)
+async def test_get_songs_with_session_not_cached(mock_verify_session: AsyncMock, mock_get_songs: AsyncMock, async_client: AsyncClient):
+    mock_verify_session.return_value = valid_session
+    mock_get_songs.return_value = []
+    await async_client.get("/songs/")
+    await async_client.get("/songs/")
+    assert mock_get_songs.await_count == 2
+
+@patch("songs.controller.get_songs", new_callable=AsyncMock)
+@patch("songs.controller.verify_session", new_callable=AsyncMock)
+async def test_get_songs_conditional_get(mock_verify_session: AsyncMock, mock_get_songs: AsyncMock, async_client: AsyncClient, catalog_version: AsyncMock):
+    mock_verify_session.return_value = valid_session
+    mock_get_songs.return_value = []
+    response = await async_client.get("/songs/?limit=5")
+    etag = response.headers["etag"]
+    assert response.headers["cache-control"] == "private, no-cache"
+
+    response = await async_client.get("/songs/?limit=5", headers={"If-None-Match": f'"other", W/{etag}'})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.headers["etag"] == etag
+    # Answered without querying the songs.
+    mock_get_songs.assert_awaited_once()
+
+    # Another page, user or catalog version gets another ETag.
+    assert (await async_client.get("/songs/?limit=6", headers={"If-None-Match": etag})).status_code == status.HTTP_200_OK
+    mock_verify_session.return_value = None
+    assert (await async_client.get("/songs/?limit=5", headers={"If-None-Match": etag})).status_code == status.HTTP_200_OK
+    mock_verify_session.return_value = valid_session
+    catalog_version.return_value += 1
+    response = await async_client.get("/songs/?limit=5", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["etag"] != etag
+
+@patch("songs.controller.get_songs", new_callable=AsyncMock)
+@patch("songs.controller.verify_session", new_callable=AsyncMock)
+async def test_get_songs_cache_hit_revalidates(mock_verify_session: AsyncMock, mock_get_songs: AsyncMock, async_client: AsyncClient):
+    # The ETag is stable over time, and a response served from the cache carries the one of the request, not the one it was cached with.
+    mock_verify_session.return_value = None
+    mock_get_songs.return_value = [Song(1, "a", "test", 4.5, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0)]
+    with patch("time.time", return_value=999.9):
+        first = await async_client.get("/songs/?limit=1")
+    with patch("time.time", return_value=1000.1):
+        cached = await async_client.get("/songs/?limit=1")
+        assert cached.headers["etag"] == first.headers["etag"]
+        assert cached.headers["x-next-cursor"] == first.headers["x-next-cursor"]
+        response = await async_client.get("/songs/?limit=1", headers={"If-None-Match": cached.headers["etag"]})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    mock_get_songs.assert_awaited_once()
+
+@patch("songs.controller.get_songs", new_callable=AsyncMock)
+@patch("songs.controller.verify_session", new_callable=AsyncMock)
+@pytest.mark.parametrize("query", ["order_by=title&cursor=WyJyYXRpbmciLCJkZXNjIiwzLjUsNywiYiJd", "cursor=not-a-cursor"])
+async def test_get_songs_bad_cursor_failure(mock_verify_session: AsyncMock, mock_get_songs: AsyncMock, query: str, async_client: AsyncClient):
+    mock_verify_session.return_value = None
+    response = await async_client.get(f"/songs/?{query}")
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    mock_get_songs.assert_not_awaited()
 
 @patch("songs.controller.get_songs", new_callable=AsyncMock)
 @patch("songs.controller.verify_session", new_callable=AsyncMock)
@@ -84,12 +192,37 @@ async def test_get_songs_req_bad_order_by_failure(mock_verify_session: AsyncMock
     mock_verify_session.assert_awaited_once()
     mock_get_songs.assert_not_awaited()
 
-@patch("songs.controller.get_song_by_idx_id", new_callable=AsyncMock)
+@patch("songs.controller.get_songs", new_callable=AsyncMock)
+@patch("songs.controller.verify_session", new_callable=AsyncMock)
+async def test_get_songs_search_by_relevance(mock_verify_session: AsyncMock, mock_get_songs: AsyncMock, async_client: AsyncClient):
+    mock_verify_session.return_value = None
+    mock_get_songs.return_value = [Song(1, "a", "test", 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0)]
+    response = await async_client.get("/songs/?search=lov&order_by=relevance&limit=1")
+    assert response.status_code == status.HTTP_200_OK
+    mock_get_songs.assert_awaited_once_with(None, "", "relevance", "asc", 0, 1, None, "lov")
+    # Relevance ranks are not a stable keyset.
+    assert "x-next-cursor" not in response.headers
+
+@patch("songs.controller.get_songs", new_callable=AsyncMock)
+@patch("songs.controller.verify_session", new_callable=AsyncMock)
+@pytest.mark.parametrize("query", ["order_by=relevance", "search=lov&order_by=relevance&cursor=abc", "search=%20-%20"])
+async def test_get_songs_bad_search_failure(mock_verify_session: AsyncMock, mock_get_songs: AsyncMock, query: str, async_client: AsyncClient):
+    mock_verify_session.return_value = None
+    response = await async_client.get(f"/songs/?{query}")
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    mock_get_songs.assert_not_awaited()
+
 @patch("songs.controller.rate_song", new_callable=AsyncMock)
-async def test_rate_song_success(mock_rate_song: AsyncMock, mock_get_song_by_idx_id: AsyncMock, async_client_with_session: AsyncClient):
-    mock_get_song_by_idx_id.return_value = Song(1, "1", "test", 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0)
+async def test_rate_song_success(mock_rate_song: AsyncMock, async_client_with_session: AsyncClient):
+    mock_rate_song.return_value = True
     request = { "rating": 3 }
     result = await async_client_with_session.put("/songs/1/1/rating", json=request)
     assert result.status_code == status.HTTP_204_NO_CONTENT
     mock_rate_song.assert_awaited_once()
-    mock_rate_song.assert_awaited_once_with(1, "1", "123", 3)
\ No newline at end of file
+    mock_rate_song.assert_awaited_once_with(1, "1", "123", 3)
+
+@patch("songs.controller.rate_song", new_callable=AsyncMock)
+async def test_rate_song_not_found(mock_rate_song: AsyncMock, async_client_with_session: AsyncClient):
+    mock_rate_song.return_value = False
+    result = await async_client_with_session.put("/songs/1/1/rating", json={ "rating": 3 })
+    assert result.status_code == status.HTTP_404_NOT_FOUND
@@ -0,0 +1,152 @@
+import io
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+import pytest
+from songs.business import import_playlist
+from songs.business.playlist_columns import iter_rows, to_columns
+from songs.business.playlist_stream import iter_playlist_columns
+from songs.entities import PlaylistFormatError
+from songs.tests.test_entities import playlist_data, transformed_songs
+
+def write_playlist(tmp_path, data) -> str:
+    path = tmp_path / "playlist.json"
+    path.write_text(json.dumps(data, indent=4))
+    return str(path)
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1 << 16])
+def test_iter_playlist_columns(chunk_size: int):
+    data = {**playlist_data, "unknown": {"0": [1, {"2": 3}]}}
+    f = io.StringIO(json.dumps(data, indent=4))
+    columns = {column: dict(entries) for column, entries in iter_playlist_columns(f, chunk_size)}
+    assert columns == {
+        column: {int(idx): value for idx, value in values.items()} for column, values in playlist_data.items()
+    }
+    assert isinstance(columns["key"][0], int)
+    assert isinstance(columns["instrumentalness"][0], float)
+
+@pytest.mark.parametrize("raw, error", [
+    ('{"id": {"0": "a"', json.JSONDecodeError),
+    ('{"id": {"0": "a"}} trailing', json.JSONDecodeError),
+    ('{"id": {"0": 1}}', PlaylistFormatError),
+    ('{"key": {"0": 1.5}}', PlaylistFormatError),
+    ('{"key": {"x": 1}}', PlaylistFormatError),
+    ('{"key": [1, 2]}', PlaylistFormatError),
+])
+def test_iter_playlist_columns_failure(raw: str, error: type):
+    with pytest.raises(error):
+        for _, entries in iter_playlist_columns(io.StringIO(raw), 4):
+            for _ in entries:
+                pass
+
+expected_songs = [
+    {
+        "idx": song.idx, "id": song.id, "title": song.title, "danceability": song.danceability, "energy": song.energy,
+        "key": song.key, "loudness": song.loudness, "mode": song.mode, "acousticness": song.acousticness,
+        "instrumentalness": song.instrumentalness, "liveness": song.liveness, "valence": song.valence,
+        "tempo": song.tempo, "duration_ms": song.duration_ms, "time_signature": song.time_signature,
+        "num_bars": song.num_bars, "num_sections": song.num_sections, "num_segments": song.num_segments,
+        "class": song.song_class
+    } for song in transformed_songs
+]
+
+@pytest.fixture
+def mock_dal():
+    upserted: list[dict] = []
+    async def upsert_song_rows(columns: list[str], rows):
+        songs = [dict(zip(columns, row)) for row in rows]
+        upserted.extend(songs)
+        return len(songs)
+    with (
+        patch("songs.business.business.upsert_song_rows", new_callable=AsyncMock, side_effect=upsert_song_rows) as upsert,
+        patch("songs.business.business.get_playlist_import_hash", new_callable=AsyncMock, return_value=None) as get_hash,
+        patch("songs.business.business.record_playlist_import", new_callable=AsyncMock) as record
+    ):
+        yield SimpleNamespace(upserted=upserted, upsert=upsert, get_hash=get_hash, record=record)
+
+def without_hashes(songs: list[dict]):
+    return [{column: value for column, value in song.items() if column != "content_hash"} for song in songs]
+
+async def test_import_playlist_streaming(mock_dal: SimpleNamespace, tmp_path):
+    result = await import_playlist(write_playlist(tmp_path, playlist_data), batch_size=2, max_in_memory_bytes=0)
+    assert (result.songs, result.changed, result.mode) == (3, 3, "streaming")
+    # 3 songs, upserted 2 at a time.
+    assert mock_dal.upsert.await_count == 2
+    assert without_hashes(mock_dal.upserted) == expected_songs
+    mock_dal.record.assert_awaited_once()
+
+async def test_import_playlist_in_memory(mock_dal: SimpleNamespace, tmp_path):
+    result = await import_playlist(write_playlist(tmp_path, playlist_data))
+    assert (result.songs, result.changed, result.mode) == (3, 3, "in_memory")
+    mock_dal.upsert.assert_awaited_once()
+    assert without_hashes(mock_dal.upserted) == expected_songs
+    mock_dal.record.assert_awaited_once()
+
+@pytest.mark.parametrize("max_in_memory_bytes", [0, 1 << 20])
+async def test_import_playlist_progress(mock_dal: SimpleNamespace, max_in_memory_bytes: int, tmp_path):
+    progress: list[tuple[int, int]] = []
+    await import_playlist(
+        write_playlist(tmp_path, playlist_data), batch_size=2, max_in_memory_bytes=max_in_memory_bytes,
+        on_progress=lambda processed, total: progress.append((processed, total))
+    )
+    # One transaction, and one report, per batch.
+    assert mock_dal.upsert.await_count == 2
+    assert progress == [(2, 3), (3, 3)]
+    assert without_hashes(mock_dal.upserted) == expected_songs
+
+async def test_import_playlist_song_hashes(mock_dal: SimpleNamespace, tmp_path):
+    changed_data = {**playlist_data, "tempo": {**playlist_data["tempo"], "1": 1.5}}
+    await import_playlist(write_playlist(tmp_path, playlist_data), max_in_memory_bytes=0)
+    await import_playlist(write_playlist(tmp_path, playlist_data), incremental=False)
+    await import_playlist(write_playlist(tmp_path, changed_data), incremental=False)
+    hashes = [song["content_hash"] for song in mock_dal.upserted]
+    # Both import paths hash a song the same way, and only the changed song gets a new hash.
+    assert hashes[0:3] == hashes[3:6]
+    assert [hashes[3] == hashes[6], hashes[4] == hashes[7], hashes[5] == hashes[8]] == [True, False, True]
+
+async def test_import_playlist_unchanged_file_skipped(mock_dal: SimpleNamespace, tmp_path):
+    path = write_playlist(tmp_path, playlist_data)
+    await import_playlist(path)
+    (recorded_path, file_hash, _) = mock_dal.record.await_args.args
+    mock_dal.get_hash.return_value = file_hash
+    mock_dal.upsert.reset_mock()
+    result = await import_playlist(path)
+    assert (result.songs, result.mode) == (0, "unchanged")
+    mock_dal.get_hash.assert_awaited_with(recorded_path)
+    mock_dal.upsert.assert_not_awaited()
+    # A full import re-reads the file regardless.
+    result = await import_playlist(path, incremental=False)
+    assert result.mode == "in_memory"
+    mock_dal.upsert.assert_awaited_once()
+
+@pytest.mark.parametrize("data", [
+    {**playlist_data, "title": {"0": "3AM", "1": "4 Walls"}},
+    {**playlist_data, "title": {"0": "3AM", "1": "4 Walls", "5": "11:11"}},
+    {key: value for key, value in playlist_data.items() if key != "tempo"},
+])
+@pytest.mark.parametrize("max_in_memory_bytes", [0, 1 << 20])
+async def test_import_playlist_mismatched_entries_failure(mock_dal: SimpleNamespace, max_in_memory_bytes: int, data: dict, tmp_path):
+    with pytest.raises(PlaylistFormatError):
+        await import_playlist(write_playlist(tmp_path, data), batch_size=2, max_in_memory_bytes=max_in_memory_bytes)
+    mock_dal.upsert.assert_not_awaited()
+    # The file is not recorded, so the import is retried on the next start.
+    mock_dal.record.assert_not_awaited()
+
+@pytest.mark.parametrize("data", [
+    {**playlist_data, "key": {"0": 8.0, "1": 4, "2": 10}},
+    {**playlist_data, "key": {"2": 10, "0": 8, "1": 4}},
+])
+def test_to_columns(data: dict):
+    names, columns = to_columns(data)
+    assert [dict(zip(names, row)) for row in iter_rows(columns)] == expected_songs
+    assert all(type(value) is int for value in columns[names.index("key")])
+
+@pytest.mark.parametrize("data", [
+    {**playlist_data, "key": {"0": 1.5, "1": 7, "2": 2}},
+    {**playlist_data, "title": {"0": "3AM", "1": 4, "2": "11:11"}},
+    {**playlist_data, "id": {"a": "1", "b": "2", "c": "3"}},
+    {**playlist_data, "tempo": [1.0, 2.0, 3.0]},
+])
+def test_to_columns_failure(data: dict):
+    with pytest.raises(PlaylistFormatError):
+        to_columns(data)
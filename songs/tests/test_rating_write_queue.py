@@ -0,0 +1,71 @@
+import asyncio
+import pytest
+from connection_pool import ConnectionPool, PoolConfig
+from songs.dal.rating_write_queue import RatingWriteConfig, RatingWriteQueue
+
+@pytest.fixture
+async def pool(tmp_path):
+    pool = ConnectionPool(PoolConfig(max_connections=1, acquire_timeout_ms=50), db_path=str(tmp_path / "test.db"))
+    async with pool.writer() as conn:
+        await conn.execute('''
+            CREATE TABLE songs (idx INTEGER, id VARCHAR, UNIQUE(idx, id))
+        ''')
+        await conn.executemany('INSERT INTO songs (idx, id) VALUES (?, ?)', [(1, "a"), (2, "b")])
+        await conn.execute('''
+            CREATE TABLE ratings (song_idx INTEGER, song_id VARCHAR, user_id VARCHAR, rating REAL, UNIQUE(song_idx, song_id, user_id))
+        ''')
+        await conn.commit()
+    yield pool
+    await pool.close()
+
+async def get_ratings(pool: ConnectionPool):
+    async with pool.connection() as conn:
+        return await conn.fetchall("SELECT song_idx, song_id, user_id, rating FROM ratings ORDER BY song_idx, user_id")
+
+async def test_concurrent_ratings_are_coalesced_into_one_commit(pool: ConnectionPool):
+    queue = RatingWriteQueue(pool, RatingWriteConfig(flush_interval_ms=50))
+    await asyncio.gather(
+        queue.submit(1, "a", "u1", 1),
+        queue.submit(1, "a", "u1", 2),
+        queue.submit(1, "a", "u2", 3),
+        queue.submit(2, "b", "u1", 4),
+    )
+    assert queue.flushed_batches == 1
+    assert queue.flushed_rows == 3
+    assert await get_ratings(pool) == [(1, "a", "u1", 2), (1, "a", "u2", 3), (2, "b", "u1", 4)]
+
+async def test_full_batch_is_flushed_without_waiting_for_the_interval(pool: ConnectionPool):
+    queue = RatingWriteQueue(pool, RatingWriteConfig(flush_interval_ms=60_000, max_batch_size=2))
+    await asyncio.wait_for(asyncio.gather(queue.submit(1, "a", "u1", 1), queue.submit(1, "a", "u2", 2)), timeout=5)
+    assert queue.flushed_batches == 1
+
+async def test_fire_and_forget_returns_before_commit(pool: ConnectionPool):
+    queue = RatingWriteQueue(pool, RatingWriteConfig(flush_interval_ms=60_000, mode='fire_and_forget'))
+    await queue.submit(1, "a", "u1", 5)
+    assert queue.flushed_batches == 0
+    await queue.close()
+    assert await get_ratings(pool) == [(1, "a", "u1", 5)]
+
+async def test_ratings_of_unknown_songs_are_not_written(pool: ConnectionPool):
+    queue = RatingWriteQueue(pool, RatingWriteConfig(flush_interval_ms=50))
+    results = await asyncio.gather(
+        queue.submit(1, "a", "u1", 1),
+        queue.submit(1, "b", "u1", 2),
+        queue.submit(1, "a", "u2", 3),
+    )
+    assert results == [True, False, True]
+    # Re-submitting the same rating writes nothing, but the song still exists.
+    assert await queue.submit(1, "a", "u1", 1) is True
+    assert queue.flushed_batches == 2
+    assert await get_ratings(pool) == [(1, "a", "u1", 1), (1, "a", "u2", 3)]
+
+async def test_flush_waits_for_a_held_writer_past_the_acquire_timeout(pool: ConnectionPool):
+    queue = RatingWriteQueue(pool, RatingWriteConfig(flush_interval_ms=1))
+    async with pool.writer():
+        rating = asyncio.create_task(queue.submit(1, "a", "u1", 5))
+        # Well past `acquire_timeout_ms`, e.g. behind a playlist import batch.
+        await asyncio.sleep(0.2)
+        assert not rating.done()
+    assert await rating is True
+    assert pool.metrics["writer"].timeouts == 0
+    assert await get_ratings(pool) == [(1, "a", "u1", 5)]
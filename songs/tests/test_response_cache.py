@@ -0,0 +1,34 @@
+from unittest.mock import patch
+from songs.response_cache import SongsCacheConfig, SongsResponseCache
+
+def test_cache_hit_and_lru_eviction():
+    cache = SongsResponseCache(SongsCacheConfig(max_size=2))
+    for key in ("a", "b"):
+        cache.put(key, 0, key.encode(), None)
+    assert cache.get("a", 0).body == b"a" # type: ignore
+    # "b" is now the least recently used.
+    cache.put("c", 0, b"c", None)
+    assert cache.get("b", 0) is None
+    assert cache.get("c", 0).body == b"c" # type: ignore
+    assert (cache.hits, cache.misses) == (2, 1)
+
+def test_cache_invalidated_by_catalog_version():
+    cache = SongsResponseCache(SongsCacheConfig())
+    cache.put("a", 0, b"a", None)
+    assert cache.get("a", 1) is None
+
+def test_cache_drops_responses_built_before_a_write():
+    cache = SongsResponseCache(SongsCacheConfig())
+    # A rating is committed while the songs are being queried: the response is cached at the version read before.
+    cache.put("a", 0, b"a", None)
+    assert cache.get("a", 1) is None
+
+@patch("songs.response_cache.time.time")
+def test_cache_entry_expires(mock_time):
+    cache = SongsResponseCache(SongsCacheConfig(ttl_seconds=5))
+    mock_time.return_value = 1000
+    cache.put("a", 0, b"a", None)
+    mock_time.return_value = 1004
+    assert cache.get("a", 0) is not None
+    mock_time.return_value = 1005
+    assert cache.get("a", 0) is None
@@ -1,17 +1,38 @@
+import re
 from typing import Union, get_type_hints
 from fastapi.exceptions import RequestValidationError
 from .entities import Song
 
+# Not a `Song` field: ranks full-text `search` matches by relevance.
+RELEVANCE_ORDER = 'relevance'
 
-def validate_get_songs_req(order_by: str, title: Union[str, None] = None):
-    song_fields = set(get_type_hints(Song).keys())
-    if order_by not in song_fields:
+# Introspected once, rather than on every request.
+SONG_FIELDS = frozenset(get_type_hints(Song).keys())
+
+def validate_get_songs_req(order_by: str, title: Union[str, None] = None, search: Union[str, None] = None, cursor: Union[str, None] = None):
+    if order_by == RELEVANCE_ORDER:
+        if search is None:
+            raise RequestValidationError([{
+                'loc': ['query', 'order_by'],
+                'msg': f'`order_by={RELEVANCE_ORDER}` is only allowed along with the `search` parameter.'
+            }])
+        if cursor is not None:
+            raise RequestValidationError([{
+                'loc': ['query', 'cursor'],
+                'msg': f'Cursor pagination is not supported with `order_by={RELEVANCE_ORDER}`, use `offset` instead.'
+            }])
+    elif order_by not in SONG_FIELDS:
         raise RequestValidationError([{
             'loc': ['query', 'order_by'],
-            'msg': f'the value of `order_by` parameter must be one of the fields of the `Song` entity, i.e. one of {song_fields}'
+            'msg': f'the value of `order_by` parameter must be one of the fields of the `Song` entity, i.e. one of {set(SONG_FIELDS)}'
         }])
     if title is not None and not len(title.strip()):
         raise RequestValidationError([{
             'loc': ['url', 'title'],
             'msg': 'Empty title not allowed.'
-        }])
\ No newline at end of file
+        }])
+    if search is not None and not re.search(r'\w', search):
+        raise RequestValidationError([{
+            'loc': ['query', 'search'],
+            'msg': 'The search text must contain at least one word.'
+        }])
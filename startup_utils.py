@@ -1,59 +1,52 @@
 from argparse import ArgumentParser
-from typing import Union, cast
+from typing import Union
 from fastapi import FastAPI, APIRouter
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import ValidationError
-from pydantic_core import ErrorDetails
 import os;
 
-from songs.entities.playlist_input import PlaylistInput
 from auth.controller import users_api, auth_api
+from common.controller import health_api, metrics_api
+from common.metrics import MetricsMiddleware
+from common.profiling import Profiler, ProfilingConfig, ProfilingMiddleware
 from songs.controller import songs_api
+from songs.pagination import NEXT_CURSOR_HEADER
 
 
-def validate_json_file(data: object):
-    '''
-    Function to validate the given data against the `PlaylistInput` class.
-
-    :raises ValidationError: If data is improperly formatted, or if any key contains an unequal # of keys.
-    '''
-    res = PlaylistInput.model_validate(data)
-    value_dicts: list[dict[str, Union[int, float, str]]] = list(res.__dict__.values())
-    if not value_dicts:
-        print("No data in file, continuing as-is.")
-        return
-    reference_keys = set(value_dicts[0].keys())
-    reference_len = len(reference_keys)
-    for key, value in res.__dict__.items():
-        value_dict = cast(dict[str, Union[int, float, str]], value)
-        keys = set(value_dict.keys())
-        if len(keys) != reference_len:
-            print(f"Entry {key} does not have {reference_len} keys: {keys}")
-            raise ValidationError([
-                ErrorDetails(
-                    type='value_error.dict.keys_length_mismatch',
-                    loc=(key,),
-                    msg=f"Entry {key} has unequal number of entries: {len(keys)} vs {reference_len}",
-                    input=value_dict
-                )
-            ])
-        if keys != reference_keys:
-            raise ValidationError([
-                ErrorDetails(
-                    type='value_error.dict.keys_mismatch',
-                    loc=(key,),
-                    msg=f"Entry {key} has different keys: {keys} vs {reference_keys}",
-                    input=value_dict
-                )
-            ])
-        
 def add_startup_arguments(parser: ArgumentParser):
     parser.add_argument(
         "-pp", 
         "--playlist_path", 
         help="Path of the file to pre-load song data.\nIf no file path is given, the program loads an empty / already existing database."
     )
+    parser.add_argument(
+        "--playlist_batch_size",
+        type=int,
+        default=5000,
+        help="Number of songs parsed and inserted at a time while streaming the playlist. Bounds the memory used by the import."
+    )
+    parser.add_argument(
+        "--playlist_max_in_memory_mb",
+        type=int,
+        default=64,
+        help="Playlists up to this size are parsed at once and bulk-loaded column by column. Larger ones are streamed in bounded memory."
+    )
+    parser.add_argument(
+        "--playlist_import_mode",
+        choices=["incremental", "full"],
+        default="incremental",
+        help="incremental: skip the import if the playlist is unchanged since it was last imported. full: always re-read it. Either way, only new or changed songs are written."
+    )
+    parser.add_argument(
+        "--db_pool_size",
+        type=int,
+        help="Number of read-only database connections. Overrides DB_POOL_SIZE (defaults to 5)."
+    )
+    parser.add_argument(
+        "--db_acquire_timeout_ms",
+        type=float,
+        help="How long a request waits for a free database connection before failing with 503. Overrides DB_ACQUIRE_TIMEOUT_MS (defaults to 2000)."
+    )
     parser.add_argument("--host", type=str, default="0.0.0.0")
     parser.add_argument("-p", "--port", type=int, default=8000)
     parser.add_argument("--env", choices=["dev", "prod"], default="dev")
@@ -70,7 +63,10 @@ def register_routes(app: FastAPI, env: Union[str, None] = "dev"):
     api_router.include_router(auth_api)
     api_router.include_router(songs_api)
     api_router.include_router(users_api)
+    api_router.include_router(health_api)
     app.include_router(api_router, prefix="/api")
+    # Served at the root, where Prometheus scrapes by default.
+    app.include_router(metrics_api)
     register_frontend(app, env)
 
 def add_middlewares(app: FastAPI, env: Union[str, None] = "dev"):
@@ -82,4 +78,12 @@ def add_middlewares(app: FastAPI, env: Union[str, None] = "dev"):
             allow_credentials=True,
             allow_methods=["*"],
             allow_headers=["*"],
+            expose_headers=[NEXT_CURSOR_HEADER, "ETag"],
         )
+    # Opt-in, see `ProfilingConfig`. The profiler is kept on the app, so that the lifespan dumps it on shutdown.
+    profiling = ProfilingConfig.from_env()
+    if profiling.enabled:
+        app.state.profiler = Profiler(profiling)
+        app.add_middleware(ProfilingMiddleware, profiler=app.state.profiler)
+    # Added last, i.e. outermost, so request latencies include every other middleware.
+    app.add_middleware(MetricsMiddleware)
@@ -0,0 +1,29 @@
+from dataclasses import dataclass
+import os
+from unittest.mock import patch
+from common.config import LazyConfig
+
+@dataclass
+class CacheConfig:
+    size: int = 10
+
+    @staticmethod
+    def from_env():
+        return CacheConfig(int(os.getenv("TEST_CACHE_SIZE", 10)))
+
+class Cache:
+    config = LazyConfig(CacheConfig.from_env)
+
+    def __init__(self, config=None) -> None:
+        self.config = config
+
+def test_config_read_from_env_on_first_access():
+    cache = Cache()
+    # Variables loaded after the service was created are honored.
+    with patch.dict(os.environ, {"TEST_CACHE_SIZE": "5"}):
+        assert cache.config.size == 5
+    assert cache.config.size == 5
+
+def test_given_config_is_kept():
+    with patch.dict(os.environ, {"TEST_CACHE_SIZE": "5"}):
+        assert Cache(CacheConfig(size=1)).config.size == 1
@@ -0,0 +1,53 @@
+import sqlite3
+import threading
+import pytest
+from connection_pool import ConnectionPool, PoolConfig, PoolTimeoutError
+
+@pytest.fixture
+async def pool(tmp_path):
+    pool = ConnectionPool(PoolConfig(max_connections=2), db_path=str(tmp_path / "test.db"))
+    yield pool
+    await pool.close()
+
+async def test_connection_runs_off_event_loop(pool: ConnectionPool):
+    async with pool.connection() as conn:
+        worker_thread = await conn.run(lambda _: threading.get_ident())
+    assert worker_thread != threading.get_ident()
+
+async def test_execute_fetch_commit(pool: ConnectionPool):
+    async with pool.writer() as conn:
+        await conn.execute("CREATE TABLE t (a INTEGER, b TEXT)")
+        inserted = await conn.executemany("INSERT INTO t VALUES (?, ?)", [(1, "x"), (2, "y")])
+        await conn.commit()
+    assert inserted == 2
+    async with pool.connection() as conn:
+        rows = await conn.fetchall("SELECT a, b FROM t ORDER BY a")
+        row = await conn.fetchone("SELECT b FROM t WHERE a = ?", [2])
+    assert rows == [(1, "x"), (2, "y")]
+    assert row == ("y",)
+
+async def test_wal_enabled_and_readers_are_read_only(pool: ConnectionPool):
+    async with pool.connection() as conn:
+        (journal_mode,) = await conn.fetchone("PRAGMA journal_mode")
+        assert journal_mode == "wal"
+        with pytest.raises(sqlite3.OperationalError):
+            await conn.execute("CREATE TABLE t (a INTEGER)")
+
+async def test_acquire_timeout_and_metrics(tmp_path):
+    pool = ConnectionPool(PoolConfig(max_connections=1, acquire_timeout_ms=50), db_path=str(tmp_path / "test.db"))
+    async def read_songs():
+        async with pool.connection() as conn:
+            await conn.fetchone("SELECT 1")
+    await read_songs()
+    async with pool.connection():
+        with pytest.raises(PoolTimeoutError):
+            async with pool.connection():
+                pass
+        assert pool.metrics["reader"].in_use == 1
+    metrics = pool.metrics["reader"]
+    assert (metrics.checkouts, metrics.timeouts, metrics.in_use) == (2, 1, 0)
+    assert metrics.wait_seconds.count == 2
+    # Hold times are recorded per call site, i.e. the function checking the connection out.
+    assert metrics.hold_seconds["test_acquire_timeout_and_metrics.<locals>.read_songs"].count == 1
+    assert metrics.hold_seconds["test_acquire_timeout_and_metrics"].count == 1
+    await pool.close()
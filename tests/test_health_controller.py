@@ -0,0 +1,61 @@
+import pytest
+from httpx import ASGITransport, AsyncClient
+from fastapi import FastAPI, status
+from unittest.mock import patch
+
+from common.controller import health_api
+from common.readiness import Readiness
+from connection_pool import ConnectionPool, PoolConfig
+
+@pytest.fixture
+def app():
+    app = FastAPI()
+    app.include_router(health_api)
+    return app
+
+@pytest.fixture
+async def async_client(app):
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+@pytest.fixture
+def readiness():
+    readiness = Readiness()
+    with patch("common.controller.readiness", readiness):
+        yield readiness
+
+async def test_live(async_client: AsyncClient):
+    response = await async_client.get("/health/live")
+    assert response.status_code == status.HTTP_200_OK
+
+async def test_ready_without_tasks(async_client: AsyncClient, readiness: Readiness):
+    response = await async_client.get("/health/ready")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"ready": True, "tasks": {}}
+
+async def test_ready_flips_once_tasks_are_over(async_client: AsyncClient, readiness: Readiness):
+    task = readiness.start("playlist_import")
+    task.processed, task.total = 5000, 20000
+    response = await async_client.get("/health/ready")
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.json()["tasks"]["playlist_import"] == {"state": "running", "processed": 5000, "total": 20000, "error": None}
+    # A failed task does not hold the server back, it serves whatever data it has.
+    task.state, task.error = "failed", "The given JSON was not valid"
+    response = await async_client.get("/health/ready")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["ready"] is True
+
+async def test_pool_metrics(async_client: AsyncClient, tmp_path):
+    pool = ConnectionPool(PoolConfig(max_connections=2), db_path=str(tmp_path / "test.db"))
+    async with pool.connection("get_songs"):
+        pass
+    with patch("common.controller.connection_pool", pool):
+        response = await async_client.get("/health/pool")
+    await pool.close()
+    assert response.status_code == status.HTTP_200_OK
+    body = response.json()
+    assert body["size"] == 2
+    assert body["reader"]["checkouts"] == 1
+    assert body["reader"]["hold_seconds"]["get_songs"]["count"] == 1
+    assert body["writer"]["in_use"] == 0
@@ -0,0 +1,82 @@
+import pytest
+from httpx import ASGITransport, AsyncClient
+from fastapi import APIRouter, FastAPI, status
+from unittest.mock import patch
+
+from common.controller import metrics_api
+from common.metrics import Histogram, MetricsMiddleware, RequestMetrics, render_prometheus
+from connection_pool import PoolMetrics
+
+@pytest.fixture
+def metrics():
+    metrics = RequestMetrics()
+    with patch("common.controller.request_metrics", metrics):
+        yield metrics
+
+@pytest.fixture
+def app(metrics: RequestMetrics):
+    songs_api = APIRouter(prefix="/songs")
+
+    @songs_api.get("/{song_idx}/{song_id}")
+    async def get_song(song_idx: int, song_id: str):
+        return { "idx": song_idx, "id": song_id }
+
+    api_router = APIRouter()
+    api_router.include_router(songs_api)
+    app = FastAPI()
+    app.include_router(api_router, prefix="/api")
+    app.include_router(metrics_api)
+    app.add_middleware(MetricsMiddleware, metrics=metrics)
+    return app
+
+@pytest.fixture
+async def async_client(app):
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+def test_histogram_buckets():
+    histogram = Histogram([0.1, 1])
+    for value in (0.05, 0.1, 0.5, 5):
+        histogram.observe(value)
+    assert histogram.counts == [2, 1, 1]
+    assert (histogram.count, histogram.sum) == (4, 5.65)
+
+async def test_requests_recorded_per_route_template(async_client: AsyncClient, metrics: RequestMetrics):
+    await async_client.get("/api/songs/1/a")
+    await async_client.get("/api/songs/2/b")
+    await async_client.get("/api/songs/x/b")
+    await async_client.get("/missing")
+    assert dict(metrics.requests) == {
+        ("GET", "/api/songs/{song_idx}/{song_id}", 200): 2,
+        ("GET", "/api/songs/{song_idx}/{song_id}", 422): 1,
+        ("GET", "unmatched", 404): 1,
+    }
+    assert metrics.duration_seconds[("GET", "/api/songs/{song_idx}/{song_id}")].count == 3
+    assert metrics.in_flight == 0
+
+async def test_metrics_endpoint(async_client: AsyncClient):
+    await async_client.get("/api/songs/1/a")
+    response = await async_client.get("/metrics")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    lines = response.text.splitlines()
+    assert 'http_requests_total{method="GET",route="/api/songs/{song_idx}/{song_id}",status="200"} 1' in lines
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/api/songs/{song_idx}/{song_id}",le="+Inf"} 1' in lines
+    # The scrape itself is in flight while rendering.
+    assert "http_requests_in_flight 1" in lines
+
+def test_render_pool_metrics():
+    pool = PoolMetrics()
+    pool.checkouts = 3
+    pool.wait_seconds.observe(0.002)
+    pool.hold_seconds["get_songs"].observe(0.02)
+    pool.hold_seconds["get_songs"].observe(20)
+    lines = render_prometheus(RequestMetrics(), { "reader": pool }).splitlines()
+    assert 'db_connection_checkouts_total{kind="reader"} 3' in lines
+    assert 'db_connection_wait_seconds_bucket{kind="reader",le="0.0025"} 1' in lines
+    # Buckets are cumulative.
+    assert 'db_connection_hold_seconds_bucket{kind="reader",site="get_songs",le="0.025"} 1' in lines
+    assert 'db_connection_hold_seconds_bucket{kind="reader",site="get_songs",le="10"} 1' in lines
+    assert 'db_connection_hold_seconds_bucket{kind="reader",site="get_songs",le="+Inf"} 2' in lines
+    assert 'db_connection_hold_seconds_count{kind="reader",site="get_songs"} 2' in lines
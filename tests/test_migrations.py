@@ -0,0 +1,45 @@
+import sqlite3
+import pytest
+from connection_pool import ConnectionPool, PoolConfig
+from migrations import list_migrations, migrate, migrate_connection
+
+def write_migrations(tmp_path, migrations: dict[str, str]):
+    migrations_dir = tmp_path / "migrations"
+    migrations_dir.mkdir()
+    for file_name, script in migrations.items():
+        (migrations_dir / file_name).write_text(script)
+    return str(migrations_dir)
+
+def test_list_migrations_in_version_order(tmp_path):
+    migrations_dir = write_migrations(tmp_path, {"0010_c.sql": "", "0002_b.sql": "", "0001_a.sql": "", "README.md": ""})
+    assert [version for version, _ in list_migrations(migrations_dir)] == [1, 2, 10]
+
+def test_migrations_apply_once(tmp_path):
+    migrations_dir = write_migrations(tmp_path, {
+        "0001_create.sql": "CREATE TABLE t (a INTEGER);",
+        "0002_index.sql": "CREATE INDEX t_a_idx ON t (a);",
+    })
+    conn = sqlite3.connect(str(tmp_path / "test.db"))
+    assert migrate_connection(conn, migrations_dir) == [1, 2]
+    assert migrate_connection(conn, migrations_dir) == []
+    assert conn.execute("PRAGMA user_version").fetchone() == (2,)
+
+def test_failing_migration_rolled_back(tmp_path):
+    migrations_dir = write_migrations(tmp_path, {
+        "0001_create.sql": "CREATE TABLE t (a INTEGER);",
+        "0002_broken.sql": "CREATE TABLE u (a INTEGER);\nINSERT INTO missing VALUES (1);",
+    })
+    conn = sqlite3.connect(str(tmp_path / "test.db"))
+    with pytest.raises(sqlite3.OperationalError):
+        migrate_connection(conn, migrations_dir)
+    assert conn.execute("PRAGMA user_version").fetchone() == (1,)
+    assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'u'").fetchone() is None
+
+async def test_migrate_provisions_a_fresh_database(tmp_path):
+    pool = ConnectionPool(PoolConfig(max_connections=1), db_path=str(tmp_path / "test.db"))
+    applied = await migrate(pool)
+    assert applied == [version for version, _ in list_migrations()]
+    async with pool.connection() as conn:
+        names = {name for (name,) in await conn.fetchall("SELECT name FROM sqlite_master")}
+    await pool.close()
+    assert {"songs", "ratings", "avg_ratings", "songs_fts", "songs_title_idx", "songs_tempo_idx", "sessions_expires_at_idx", "ratings_user_id_idx"} <= names
@@ -0,0 +1,77 @@
+import pstats
+from typing import Union
+from httpx import ASGITransport, AsyncClient
+from fastapi import APIRouter, Depends, FastAPI, status
+
+from common.profiling import PROFILE_HEADER, Profiler, ProfilingConfig, ProfilingMiddleware, span, timed
+from common.responses import OrjsonResponse
+
+@timed("session_verify")
+async def verify_session(song_idx: int):
+    return song_idx
+
+def make_app(config: ProfilingConfig):
+    songs_api = APIRouter(prefix="/songs")
+
+    @songs_api.get("/{song_idx}")
+    async def get_song(song_idx: int, session: int = Depends(verify_session)):
+        with span("dal.query"):
+            pass
+        with span("dal.query"):
+            pass
+        return OrjsonResponse({ "idx": song_idx })
+
+    app = FastAPI()
+    app.include_router(songs_api, prefix="/api")
+    app.state.profiler = Profiler(config)
+    app.add_middleware(ProfilingMiddleware, profiler=app.state.profiler)
+    return app
+
+async def request(app: FastAPI, headers: Union[dict, None] = None):
+    headers = headers or {}
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.get("/api/songs/1", headers=headers)
+
+def server_timing(response):
+    return { entry.split(";")[0] for entry in response.headers["server-timing"].split(", ") }
+
+async def test_sampled_request_gets_span_breakdown(tmp_path):
+    config = ProfilingConfig(enabled=True, sample_rate=1, output_dir=str(tmp_path))
+    response = await request(make_app(config))
+    assert response.status_code == status.HTTP_200_OK
+    assert server_timing(response) == { "session_verify", "dal.query", "json_encoding", "total" }
+
+async def test_header_token_forces_profiling(tmp_path):
+    config = ProfilingConfig(enabled=True, sample_rate=0, header_token="secret", output_dir=str(tmp_path))
+    app = make_app(config)
+    assert "server-timing" not in (await request(app)).headers
+    assert "server-timing" not in (await request(app, { PROFILE_HEADER: "wrong" })).headers
+    assert "total" in server_timing(await request(app, { PROFILE_HEADER: "secret" }))
+
+def test_span_outside_sampled_request():
+    with span("dal.query"):
+        pass
+
+async def test_dump(tmp_path):
+    config = ProfilingConfig(enabled=True, sample_rate=1, cprofile=True, output_dir=str(tmp_path), flush_every=1000)
+    app = make_app(config)
+    await request(app)
+    await request(app)
+    assert not (tmp_path / "spans.jsonl").exists()
+    await app.state.profiler.dump()
+    records = (tmp_path / "spans.jsonl").read_text().splitlines()
+    assert len(records) == 2
+    assert '"route": "/api/songs/{song_idx}"' in records[0]
+    assert pstats.Stats(str(tmp_path / "profile.prof")).total_calls > 0
+
+async def test_records_flushed_every_n_requests(tmp_path):
+    config = ProfilingConfig(enabled=True, sample_rate=1, output_dir=str(tmp_path), flush_every=2)
+    app = make_app(config)
+    for _ in range(3):
+        await request(app)
+    # Written off the event loop, by the profiler's writer thread.
+    app.state.profiler._executor.submit(lambda: None).result()
+    assert len((tmp_path / "spans.jsonl").read_text().splitlines()) == 2
+    await app.state.profiler.dump()
+    assert len((tmp_path / "spans.jsonl").read_text().splitlines()) == 3
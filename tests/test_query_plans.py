@@ -0,0 +1,36 @@
+import sqlite3
+import pytest
+# Imported for their statements to be registered.
+import auth.dal
+import songs.dal
+from migrations import migrate_connection
+from query_plans import RegisteredQuery, check_query_plans, registered_queries
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    migrate_connection(conn)
+    yield conn
+    conn.close()
+
+def test_dal_queries_registered():
+    names = {query.name for query in registered_queries()}
+    assert {"auth.get_user", "auth.get_session", "songs.song_exists", "songs.get_playlist_import_hash", "songs.record_playlist_import", "songs.upsert_rating"} <= names
+    assert {"songs.get_songs[tempo]", "songs.get_songs[tempo, after]", "songs.get_songs[relevance, search]"} <= names
+
+def test_dal_query_plans_do_not_scan(conn):
+    # Fails whenever a DAL statement starts reading a whole table, e.g. after an index is dropped or a query rewritten.
+    assert check_query_plans(conn) == {}
+
+def test_scans_flagged(conn):
+    queries = [
+        RegisteredQuery("full_scan", "SELECT * FROM songs WHERE title = ?", ["a"]),
+        RegisteredQuery("sort", "SELECT * FROM ratings ORDER BY rating"),
+        RegisteredQuery("seek", "SELECT * FROM songs WHERE idx = ? AND id = ?", [0, "a"]),
+        RegisteredQuery("allowed", "SELECT * FROM songs s ORDER BY tempo, idx, id LIMIT 10", allow=("SCAN s USING INDEX songs_tempo_idx",)),
+    ]
+    conn.execute("DROP INDEX songs_title_idx")
+    assert check_query_plans(conn, queries) == {
+        "full_scan": ["SCAN songs"],
+        "sort": ["SCAN ratings", "USE TEMP B-TREE FOR ORDER BY"],
+    }